@@ -0,0 +1,244 @@
+"""
+The hand-written _process_item implementations that the declarative field
+mappings replaced, kept verbatim (minus `self`) as the benchmark baseline.
+"""
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _process_review_data(item):
+    return {
+        'rating': float(item.get('rating') or item.get('stars', 0) or 0),
+        'reviews_count': int(item.get('reviewsCount') or item.get('numberOfReviews', 0) or 0),
+        'review_analysis': None
+    }
+
+
+def amazon(item, options):
+    title = item.get('title', '')
+    if not title:
+        logger.debug("Skipping product with no title")
+        return None
+
+    price = (item.get('price') or
+             item.get('currentPrice') or
+             item.get('listPrice', 'N/A'))
+
+    url = (item.get('url') or
+           item.get('itemUrl') or
+           item.get('link', ''))
+
+    if not url:
+        asin = item.get('asin', '')
+        if asin:
+            url = f"https://www.amazon.{options.region}/dp/{asin}"
+        else:
+            logger.debug(f"Skipping Amazon product missing URL: {title}")
+            return None
+
+    review_data = _process_review_data(item)
+
+    return {
+        'title': title,
+        'price': price,
+        'url': url,
+        'is_prime': item.get('isAmazonPrime') or item.get('isPrime', False),
+        'asin': item.get('asin', ''),
+        'marketplace': 'Amazon',
+        **review_data
+    }
+
+
+def temu(item, options):
+    logger.debug(f"Processing Temu item: {json.dumps(item, indent=2)}")
+
+    title = (item.get('title') or
+             item.get('name') or
+             item.get('productName') or
+             item.get('product_name') or
+             '')
+
+    if not title:
+        logger.debug("Skipping Temu product with no title")
+        return None
+
+    price = item.get('price')
+    if isinstance(price, dict):
+        price = price.get('value', 'N/A')
+    if not price or price == 'N/A':
+        price = item.get('salePrice', {}).get('value') or item.get('originalPrice', {}).get('value')
+    if price is None:
+        price = 'N/A'
+    else:
+        price = f"${price}" if not str(price).startswith('$') else str(price)
+
+    url = (item.get('url') or
+           item.get('productUrl') or
+           item.get('link') or
+           item.get('link_url') or
+           '')
+
+    if not url and (product_id := (item.get('id') or item.get('productId'))):
+        url = f"https://www.temu.com/product/{product_id}.html"
+
+    if not url:
+        logger.debug(f"Skipping Temu product missing URL: {title}")
+        return None
+
+    rating = 0
+    review_count = 0
+
+    if isinstance(item.get('rating'), dict):
+        rating = float(item['rating'].get('value', 0))
+    elif isinstance(item.get('rating'), (int, float)):
+        rating = float(item['rating'])
+
+    if 'reviews' in item and isinstance(item['reviews'], list):
+        review_count = len(item['reviews'])
+    elif 'reviewsCount' in item:
+        review_count = int(item['reviewsCount'])
+
+    shipping = 'N/A'
+    if 'shipping' in item:
+        if isinstance(item['shipping'], dict):
+            shipping = item['shipping'].get('deliveryDays', 'N/A')
+        elif isinstance(item['shipping'], str):
+            shipping = item['shipping']
+
+    return {
+        'title': title,
+        'price': price,
+        'url': url,
+        'marketplace': 'Temu',
+        'rating': rating,
+        'review_count': review_count,
+        'shipping': shipping,
+        'seller': 'Temu seller'
+    }
+
+
+def jumia(item, options):
+    title = (item.get('name') or
+             item.get('productName') or
+             item.get('displayName') or
+             item.get('product_name') or
+             '')
+    if not title:
+        logger.debug("Skipping Jumia product with no title")
+        return None
+
+    price = item.get('prices', 'N/A')
+    url = item.get('url', '')
+
+    if not url:
+        logger.debug(f"Skipping Jumia product missing URL: {title}")
+        return None
+
+    review_data = _process_review_data(item)
+
+    return {
+        'title': title,
+        'price': price,
+        'url': url,
+        'marketplace': 'Jumia',
+        **review_data
+    }
+
+
+def alibaba(item, options):
+    title = (item.get('title') or
+             item.get('name') or
+             item.get('productName') or
+             item.get('product_name') or
+             '')
+    if not title:
+        logger.debug("Skipping Alibaba product with no title")
+        return None
+
+    min_price = item.get('minPrice')
+    max_price = item.get('maxPrice')
+    if min_price is None and max_price is None:
+        price = item.get('price')
+    else:
+        price = f"${min_price}" if min_price == max_price else f"${min_price}-${max_price}"
+
+    url = item.get('productUrl', '')
+
+    if not url:
+        logger.debug(f"Skipping Alibaba product missing URL: {title}")
+        return None
+
+    reviewScore = item.get('reviewScore', 0)
+    reviewCount = item.get('reviewCount', 0)
+    review_data = {'rating': reviewScore, 'reviews_count': reviewCount} if reviewScore and reviewCount else {}
+
+    return {
+        'title': title,
+        'price': price,
+        'url': url,
+        'marketplace': 'Alibaba',
+        **review_data
+    }
+
+
+def aliexpress(item, options):
+    title = (item.get('title') or
+             item.get('name') or
+             item.get('productName') or
+             item.get('product_name') or
+             '')
+    if not title:
+        logger.debug("Skipping AliExpress product with no title")
+        return None
+
+    price = item.get('price')
+    if not price:
+        price = item.get('salePrice') or item.get('originalPrice') or 'N/A'
+
+    if price != 'N/A' and not str(price).startswith('$'):
+        price = f"${price}"
+
+    url = item.get('productUrl') or item.get('url') or ''
+    if not url:
+        logger.debug(f"Skipping AliExpress product missing URL: {title}")
+        return None
+
+    rating = item.get('rating', 0)
+    if isinstance(rating, str):
+        try:
+            rating = float(rating)
+        except ValueError:
+            rating = 0
+
+    review_count = item.get('reviewCount', 0) or item.get('reviews', 0)
+    if isinstance(review_count, str):
+        try:
+            review_count = int(review_count)
+        except ValueError:
+            review_count = 0
+
+    shipping = item.get('shipping', 'N/A')
+    if isinstance(shipping, dict):
+        shipping = shipping.get('time', 'N/A')
+
+    return {
+        'title': title,
+        'price': price,
+        'url': url,
+        'marketplace': 'AliExpress',
+        'rating': rating,
+        'review_count': review_count,
+        'shipping': shipping,
+        'seller': item.get('store', {}).get('name', 'AliExpress seller') if isinstance(item.get('store'), dict) else 'AliExpress seller'
+    }
+
+
+LEGACY_NORMALIZERS = {
+    'amazon': amazon,
+    'temu': temu,
+    'jumia': jumia,
+    'alibaba': alibaba,
+    'aliexpress': aliexpress,
+}
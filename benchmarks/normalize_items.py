@@ -0,0 +1,149 @@
+"""
+Per-item normalization throughput: compiled field mappings vs the legacy
+hand-written _process_item code (benchmarks/legacy_normalizers.py).
+
+    python -m benchmarks.normalize_items [--payloads DIR] [--items N] [--repeat R]
+
+With --payloads, DIR/<marketplace>.json (a JSON array, e.g. a dataset export
+from the Apify console) is used for each marketplace that has one; the others
+get synthetic items shaped like that actor's output. Before timing, both
+normalizers are run over the same items and any item they map differently is
+reported (the exit status is 1 if there are any).
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import time
+
+from benchmarks.legacy_normalizers import LEGACY_NORMALIZERS
+from marketplace_api.amazon_client import AmazonClient
+from marketplace_api.marketplace_clients import AlibabaClient, AliExpressClient, JumiaClient, TemuClient
+
+CLIENTS = {
+    'amazon': AmazonClient,
+    'temu': TemuClient,
+    'jumia': JumiaClient,
+    'alibaba': AlibabaClient,
+    'aliexpress': AliExpressClient,
+}
+
+
+def _synthetic_item(marketplace, rng, index):
+    title = f"Stainless steel air fryer {index} 5.8QT digital touchscreen"
+    rating = round(rng.uniform(3, 5), 1)
+    reviews = rng.randint(0, 5000)
+    price = round(rng.uniform(5, 300), 2)
+    if marketplace == 'amazon':
+        return {
+            'title': title, 'price': {'value': price, 'currency': '$'} if index % 3 else None,
+            'listPrice': price * 1.2, 'asin': f"B0{index:08d}",
+            'url': None if index % 4 == 0 else f"https://www.amazon.com/dp/B0{index:08d}",
+            'isPrime': bool(index % 2), 'stars': rating, 'reviewsCount': reviews,
+        }
+    if marketplace == 'temu':
+        return {
+            'title': title, 'price': 'N/A' if index % 5 == 0 else {'value': price},
+            'salePrice': {'value': price * 0.9},
+            'id': 600000 + index, 'rating': {'value': rating}, 'reviewsCount': reviews,
+            'shipping': {'deliveryDays': rng.randint(3, 15)},
+        }
+    if marketplace == 'jumia':
+        return {
+            'name': title, 'prices': f"KSh {price * 130:,.0f}",
+            'url': f"https://www.jumia.co.ke/air-fryer-{index}.html", 'rating': rating, 'reviewsCount': reviews,
+        }
+    if marketplace == 'alibaba':
+        return {
+            'title': title, 'minPrice': price, 'maxPrice': price * 2 if index % 2 else price,
+            'productUrl': f"https://www.alibaba.com/product-detail/{index}.html",
+            'reviewScore': rating, 'reviewCount': reviews,
+        }
+    return {
+        'title': title, 'price': 'N/A' if index % 7 == 0 else f"{price}", 'productUrl': f"https://www.aliexpress.com/item/{index}.html",
+        'rating': str(rating), 'reviewCount': str(reviews), 'shipping': {'time': '7-15 days'},
+        'store': {'name': 'Home Appliance Store'},
+    }
+
+
+def load_payload(marketplace, payload_dir, items, rng):
+    if payload_dir:
+        path = os.path.join(payload_dir, f"{marketplace}.json")
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                return json.load(f), path
+    return [_synthetic_item(marketplace, rng, index) for index in range(items)], 'synthetic'
+
+
+def _outcome(normalize, item, options):
+    try:
+        return normalize(item, options)
+    except Exception as e:
+        return f"<{type(e).__name__}>"
+
+
+def compare(legacy, compiled, items, options):
+    """Returns (index, legacy product, compiled product) for every item mapped differently"""
+    mismatches = []
+    for index, item in enumerate(items):
+        expected = _outcome(legacy, item, options)
+        actual = _outcome(compiled, item, options)
+        if expected != actual:
+            mismatches.append((index, expected, actual))
+    return mismatches
+
+
+def measure(normalize, items, options, repeat):
+    """Best-of-`repeat` items per second"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for item in items:
+            try:
+                normalize(item, options)
+            except Exception:
+                pass
+        best = min(best, time.perf_counter() - started)
+    return len(items) / best if best else float('inf')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--payloads', help="directory of <marketplace>.json dataset exports")
+    parser.add_argument('--items', type=int, default=20000, help="synthetic items per marketplace")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--log-level', default='WARNING', help="the bot itself runs at DEBUG")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+
+    rng = random.Random(42)
+    print(
+        f"{'marketplace':<12}{'items':>8}{'mismatches':>12}{'legacy/s':>14}{'compiled/s':>14}{'speedup':>9}  payload"
+    )
+    differing = {}
+    for marketplace, client_class in CLIENTS.items():
+        client = client_class()
+        options = client.resolve_options()
+        items, source = load_payload(marketplace, args.payloads, args.items, rng)
+        mismatches = compare(LEGACY_NORMALIZERS[marketplace], client._process_item, items, options)
+        if mismatches:
+            differing[marketplace] = mismatches
+        legacy = measure(LEGACY_NORMALIZERS[marketplace], items, options, args.repeat)
+        compiled = measure(client._process_item, items, options, args.repeat)
+        print(
+            f"{marketplace:<12}{len(items):>8}{len(mismatches):>12}{legacy:>14,.0f}{compiled:>14,.0f}"
+            f"{compiled / legacy:>8.2f}x  {source}"
+        )
+
+    for marketplace, mismatches in differing.items():
+        index, expected, actual = mismatches[0]
+        print(f"\n{marketplace}: item {index} differs (first of {len(mismatches)})")
+        print(f"  legacy:   {expected}")
+        print(f"  compiled: {actual}")
+    if differing:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,5 +4,111 @@ from dotenv import load_dotenv
 load_dotenv()
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+# Updates handled at once; searches wait minutes on actor runs, so they must not
+# hold up other users' updates
+TELEGRAM_CONCURRENT_UPDATES = int(os.getenv("TELEGRAM_CONCURRENT_UPDATES", "256"))
 
 APIFY_API_TOKEN = os.getenv("APIFY_API_TOKEN")
+
+# Search result cache
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", "900"))
+# Capped by the total number of cached products, not entries
+QUERY_CACHE_MAX_PRODUCTS = int(os.getenv("QUERY_CACHE_MAX_PRODUCTS", "100000"))
+QUERY_SIMILARITY_THRESHOLD = float(os.getenv("QUERY_SIMILARITY_THRESHOLD", "0.85"))
+
+# Dataset download: "projected" fetches only the fields each client reads in one bulk
+# request, "iterate" pages through full items
+DATASET_FETCH_MODE = os.getenv("DATASET_FETCH_MODE", "projected")
+
+# Adaptive per-marketplace result budget (actor maxItems)
+RESULT_BUDGET_MIN_ITEMS = int(os.getenv("RESULT_BUDGET_MIN_ITEMS", "5"))
+RESULT_BUDGET_MAX_ITEMS = int(os.getenv("RESULT_BUDGET_MAX_ITEMS", "20"))
+RESULT_BUDGET_EXPLORE_RATE = float(os.getenv("RESULT_BUDGET_EXPLORE_RATE", "0.1"))
+RESULT_BUDGET_MIN_SAMPLES = int(os.getenv("RESULT_BUDGET_MIN_SAMPLES", "20"))
+RESULT_BUDGET_LATENCY_TARGET = float(os.getenv("RESULT_BUDGET_LATENCY_TARGET", "60"))
+
+# Search scheduling
+SEARCH_MAX_CONCURRENT = int(os.getenv("SEARCH_MAX_CONCURRENT", "5"))
+SEARCH_MAX_PER_USER = int(os.getenv("SEARCH_MAX_PER_USER", "2"))
+SEARCH_MAX_QUEUE_DEPTH = int(os.getenv("SEARCH_MAX_QUEUE_DEPTH", "50"))
+# Threads for blocking actor runs (non-webhook mode); each holds one for the whole run
+SEARCH_WORKER_THREADS = int(os.getenv("SEARCH_WORKER_THREADS", "32"))
+
+# Store of fetched results for paging, one session per result message
+RESULT_STORE_TTL = int(os.getenv("RESULT_STORE_TTL", "1800"))
+RESULT_STORE_MAX_SESSIONS = int(os.getenv("RESULT_STORE_MAX_SESSIONS", "10000"))
+RESULT_STORE_MAX_RECORDS = int(os.getenv("RESULT_STORE_MAX_RECORDS", "50"))
+
+# Inline mode (@bot query); answered from cached results only
+INLINE_LATENCY_BUDGET = float(os.getenv("INLINE_LATENCY_BUDGET", "0.5"))
+INLINE_MIN_QUERY_LENGTH = int(os.getenv("INLINE_MIN_QUERY_LENGTH", "3"))
+INLINE_FETCH_DELAY = float(os.getenv("INLINE_FETCH_DELAY", "1.5"))
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "60"))
+# Unseen inline queries are prefetched from these marketplaces only
+INLINE_PREFETCH_MARKETPLACES = [
+    m.strip() for m in os.getenv("INLINE_PREFETCH_MARKETPLACES", "amazon,temu").split(",") if m.strip()
+]
+
+# Local full-text index of fetched products
+PRODUCT_INDEX_ENABLED = os.getenv("PRODUCT_INDEX_ENABLED", "true").lower() == "true"
+PRODUCT_INDEX_PATH = os.getenv("PRODUCT_INDEX_PATH", "data/product_index.db")
+PRODUCT_INDEX_MIN_RESULTS = int(os.getenv("PRODUCT_INDEX_MIN_RESULTS", "5"))
+PRODUCT_INDEX_MAX_AGE = int(os.getenv("PRODUCT_INDEX_MAX_AGE", "21600"))
+PRODUCT_INDEX_RETENTION = int(os.getenv("PRODUCT_INDEX_RETENTION", "604800"))
+PRODUCT_INDEX_BATCH_SIZE = int(os.getenv("PRODUCT_INDEX_BATCH_SIZE", "500"))
+PRODUCT_INDEX_FLUSH_INTERVAL = float(os.getenv("PRODUCT_INDEX_FLUSH_INTERVAL", "1.0"))
+# Threads for index lookups, kept apart from actor runs so lookups never queue behind them
+INDEX_LOOKUP_THREADS = int(os.getenv("INDEX_LOOKUP_THREADS", "2"))
+
+# Session memory bounds
+SESSION_IDLE_TIMEOUT = int(os.getenv("SESSION_IDLE_TIMEOUT", "3600"))
+SESSION_MAX_TRACKED = int(os.getenv("SESSION_MAX_TRACKED", "100000"))
+SESSION_SWEEP_INTERVAL = int(os.getenv("SESSION_SWEEP_INTERVAL", "300"))
+
+# Regions searched by the multi-region fan-out
+AMAZON_REGIONS = [r.strip() for r in os.getenv("AMAZON_REGIONS", "com,co.uk,de").split(",") if r.strip()]
+JUMIA_COUNTRIES = [c.strip() for c in os.getenv("JUMIA_COUNTRIES", "kenya,nigeria,egypt").split(",") if c.strip()]
+
+# Apify API endpoint (override to point clients at a local fake server)
+APIFY_API_URL = os.getenv("APIFY_API_URL")
+
+# Webhook-driven actor completion: runs are started without waiting and a local
+# endpoint receives Apify's completion webhook. APIFY_WEBHOOK_PUBLIC_URL must be
+# reachable by Apify and route to APIFY_WEBHOOK_HOST:APIFY_WEBHOOK_PORT.
+APIFY_WEBHOOK_ENABLED = os.getenv("APIFY_WEBHOOK_ENABLED", "false").lower() == "true"
+APIFY_WEBHOOK_HOST = os.getenv("APIFY_WEBHOOK_HOST", "0.0.0.0")
+APIFY_WEBHOOK_PORT = int(os.getenv("APIFY_WEBHOOK_PORT", "8081"))
+APIFY_WEBHOOK_PUBLIC_URL = os.getenv("APIFY_WEBHOOK_PUBLIC_URL", "http://localhost:8081/apify/webhook")
+APIFY_WEBHOOK_SECRET = os.getenv("APIFY_WEBHOOK_SECRET")
+APIFY_RUN_TIMEOUT = int(os.getenv("APIFY_RUN_TIMEOUT", "600"))
+
+# Apify plan limits shared by all marketplace clients
+APIFY_MAX_CONCURRENT_RUNS = int(os.getenv("APIFY_MAX_CONCURRENT_RUNS", "25"))
+APIFY_API_RATE = float(os.getenv("APIFY_API_RATE", "30"))
+APIFY_API_BURST = int(os.getenv("APIFY_API_BURST", "30"))
+APIFY_MAX_RETRIES = int(os.getenv("APIFY_MAX_RETRIES", "5"))
+APIFY_BACKOFF_BASE = float(os.getenv("APIFY_BACKOFF_BASE", "1.0"))
+APIFY_BACKOFF_MAX = float(os.getenv("APIFY_BACKOFF_MAX", "60"))
+
+# Telegram user ids allowed to use admin commands (comma separated)
+ADMIN_USER_IDS = {int(i) for i in os.getenv("ADMIN_USER_IDS", "").split(",") if i.strip()}
+
+# Sampling profiler for the CPU stages of searches: normalization, grouping and
+# formatting, not the actor runs (toggle at runtime with /profile)
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", "0.01"))
+PROFILER_SLOW_THRESHOLD = float(os.getenv("PROFILER_SLOW_THRESHOLD", "2"))
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.01"))
+PROFILER_OUTPUT_DIR = os.getenv("PROFILER_OUTPUT_DIR", "logs/profiles")
+PROFILER_MAX_FILES = int(os.getenv("PROFILER_MAX_FILES", "50"))
+
+# Worker processes for normalizing, ranking and grouping large result sets
+PROCESS_POOL_ENABLED = os.getenv("PROCESS_POOL_ENABLED", "true").lower() == "true"
+PROCESS_POOL_THRESHOLD = int(os.getenv("PROCESS_POOL_THRESHOLD", "200"))
+PROCESS_POOL_CHUNK_SIZE = int(os.getenv("PROCESS_POOL_CHUNK_SIZE", "100"))
+PROCESS_POOL_WORKERS = int(os.getenv("PROCESS_POOL_WORKERS", "0")) or None
+
+# Price watches
+WATCH_DB_PATH = os.getenv("WATCH_DB_PATH", "data/watchlist.db")
+WATCH_INTERVAL = int(os.getenv("WATCH_INTERVAL", "21600"))
+WATCH_MAX_PER_USER = int(os.getenv("WATCH_MAX_PER_USER", "10"))
@@ -3,6 +3,7 @@ from telegram.ext import Application, CommandHandler
 
 from config import settings
 from telegram_bot.handler import BestDealHandler
+from telegram_bot.session_manager import SessionManager
 
 # Configure logging with more detailed format
 logging.basicConfig(
@@ -24,15 +25,29 @@ def main():
     logger.info("Starting the bot...")
     try:
         logger.info(f"Using bot token: {settings.TELEGRAM_BOT_TOKEN[:5]}...")
-        application = Application.builder().token(settings.TELEGRAM_BOT_TOKEN).build()
-        logger.info("Bot application built successfully")
-        
         # Create handler instance
         handler = BestDealHandler()
+
+        application = (
+            Application.builder()
+            .token(settings.TELEGRAM_BOT_TOKEN)
+            # Without this, one user's search (minutes of actor runs) blocks every other update
+            .concurrent_updates(settings.TELEGRAM_CONCURRENT_UPDATES)
+            .post_init(handler.post_init)
+            .post_shutdown(handler.post_shutdown)
+            .build()
+        )
+        logger.info("Bot application built successfully")
         
         # Register command handlers
         application.add_handler(CommandHandler("start", handler.start))
-        application.add_handler(handler.get_conversation_handler())
+        application.add_handler(CommandHandler("profile", handler.profile_command))
+        conversation = handler.get_conversation_handler()
+        application.add_handler(conversation)
+        application.add_handler(handler.get_result_browser_handler())
+        application.add_handler(handler.get_inline_query_handler())
+        application.add_handlers(handler.price_watcher.get_handlers())
+        SessionManager().register(application, conversations=[conversation])
         logger.info("Command handlers registered")
 
         # Start the bot until you press Ctrl-C
@@ -1,5 +1,11 @@
 from .marketplace_manager import MarketplaceManager
 from .amazon_client import AmazonClient
 from .marketplace_clients import TemuClient, JumiaClient, AlibabaClient
+from .quota_governor import (
+    ApifyQuotaError, PRIORITY_BACKGROUND, PRIORITY_MULTI, PRIORITY_SINGLE, get_governor
+)
+from .search_scheduler import SearchScheduler, SchedulerBusyError, UserQuotaExceededError
 
-__all__ = ['MarketplaceManager', 'AmazonClient', 'TemuClient', 'JumiaClient', 'AlibabaClient']
+__all__ = ['MarketplaceManager', 'AmazonClient', 'TemuClient', 'JumiaClient', 'AlibabaClient',
+           'SearchScheduler', 'SchedulerBusyError', 'UserQuotaExceededError',
+           'ApifyQuotaError', 'PRIORITY_BACKGROUND', 'PRIORITY_MULTI', 'PRIORITY_SINGLE', 'get_governor']
@@ -1,18 +1,31 @@
 import logging
 from .base_client import MarketplaceClient
+from .field_mapping import Field, FieldMapping, Template
 
 logger = logging.getLogger(__name__)
 
 class AmazonClient(MarketplaceClient):
+    FIELD_MAP = FieldMapping({
+        'title': Field('title', required=True),
+        'price': Field('price', 'currentPrice', 'listPrice', default='N/A'),
+        'url': Field('url', 'itemUrl', 'link', Template("https://www.amazon.{region}/dp/{asin}", asin='asin'),
+                     required=True),
+        'is_prime': Field('isAmazonPrime', 'isPrime', default=False),
+        'asin': Field('asin', default=''),
+        'marketplace': 'Amazon',
+        'rating': Field('rating', 'stars', coerce='float', default=0.0),
+        'reviews_count': Field('reviewsCount', 'numberOfReviews', coerce='int', default=0),
+        'review_analysis': None,  # Placeholder for future AI analysis
+    })
+
     def __init__(self, region="com"):
-        super().__init__("junglee/Amazon-crawler")
-        self.region = region
+        super().__init__("junglee/Amazon-crawler", default_region=region)
 
-    def _prepare_actor_input(self, search_query):
-        search_url = f"https://www.amazon.{self.region}/s?k={search_query.replace(' ', '+')}"
+    def _prepare_actor_input(self, search_query, options):
+        search_url = f"https://www.amazon.{options.region}/s?k={search_query.replace(' ', '+')}"
         return {
             "categoryOrProductUrls": [{"url": search_url}],
-            "maxItemsPerStartUrl": 20,
+            "maxItemsPerStartUrl": options.max_items,
             "proxyCountry": "AUTO_SELECT_PROXY_COUNTRY",
             "maxOffers": 0,
             "scrapeSellers": False,
@@ -22,41 +35,3 @@ class AmazonClient(MarketplaceClient):
             "scrapeProductDetails": False,
             "locationDeliverableRoutes": ["SEARCH"],
         }
-
-    def _process_item(self, item):
-        title = item.get('title', '')
-        if not title:
-            logger.debug("Skipping product with no title")
-            return None
-
-        # Try different price fields that Apify might return
-        price = (item.get('price') or 
-                item.get('currentPrice') or 
-                item.get('listPrice', 'N/A'))
-        
-        # Try different URL fields
-        url = (item.get('url') or 
-              item.get('itemUrl') or 
-              item.get('link', ''))
-        
-        if not url:
-            # Construct URL if not provided
-            asin = item.get('asin', '')
-            if asin:
-                url = f"https://www.amazon.{self.region}/dp/{asin}"
-            else:
-                logger.debug(f"Skipping Amazon product missing URL: {title}")
-                return None
-
-        # Process review data separately
-        review_data = self._process_review_data(item)
-        
-        return {
-            'title': title,
-            'price': price,
-            'url': url,
-            'is_prime': item.get('isAmazonPrime') or item.get('isPrime', False),
-            'asin': item.get('asin', ''),
-            'marketplace': 'Amazon',
-            **review_data
-        }
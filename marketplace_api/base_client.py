@@ -1,54 +1,117 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+import json
 import logging
-from apify_client import ApifyClient
+import time
+from apify_client import ApifyClient, ApifyClientAsync
 import httpx
 
 from config import settings
+from utils.sampling_profiler import get_profiler
+from . import process_pool
+from .quota_governor import ApifyQuotaError, PRIORITY_SINGLE, get_governor
 
 logger = logging.getLogger(__name__)
 
+
+@dataclass(frozen=True)
+class SearchOptions:
+    """
+    Per-request search settings. Clients never keep request state on themselves,
+    so one client can serve concurrent searches for different regions.
+    """
+    region: Optional[str] = None
+    max_items: int = 20
+    priority: int = PRIORITY_SINGLE
+
+
 class MarketplaceClient(ABC):
-    def __init__(self, actor_id):
+    # FieldMapping from dataset items to products, compiled once per client class
+    FIELD_MAP = None
+    # Dataset fields read by _process_item. When set, only these fields are downloaded.
+    # Defaults to the fields FIELD_MAP reads
+    DATASET_FIELDS = None
+    DEFAULT_MAX_ITEMS = 20
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.__dict__.get('FIELD_MAP') is not None:
+            if '_process_item' not in cls.__dict__:
+                cls._process_item = cls.FIELD_MAP.compile(f"_process_item_{cls.__name__}")
+            if 'DATASET_FIELDS' not in cls.__dict__:
+                cls.DATASET_FIELDS = cls.FIELD_MAP.source_fields
+
+    def __init__(self, actor_id, default_region=None):
         logger.debug(f"Initializing client for actor {actor_id} with token: {settings.APIFY_API_TOKEN}")
-        self.client = ApifyClient(settings.APIFY_API_TOKEN)
+        self.client = ApifyClient(settings.APIFY_API_TOKEN, api_url=settings.APIFY_API_URL)
+        self.async_client = ApifyClientAsync(settings.APIFY_API_TOKEN, api_url=settings.APIFY_API_URL)
         self.actor_id = actor_id
+        self.default_region = default_region
+        # Shared by every client so Apify plan limits hold process-wide
+        self.governor = get_governor()
+        self.profiler = get_profiler()
 
     @abstractmethod
-    def _process_item(self, item):
-        """Process a single item from the marketplace response"""
+    def _process_item(self, item, options):
+        """
+        Maps a single item from the marketplace response to a product, or None to skip it.
+        Generated from FIELD_MAP when the client declares one
+        """
         pass
 
     @abstractmethod
-    def _prepare_actor_input(self, search_query):
+    def _prepare_actor_input(self, search_query, options):
         """Prepare the input for the Apify actor"""
         pass
 
-    def search_products(self, product_name):
+    def resolve_options(self, region=None, max_items=None, priority=PRIORITY_SINGLE):
+        """Builds the options for one search, filling in this client's defaults"""
+        return SearchOptions(
+            region=region or self.default_region,
+            max_items=max_items or self.DEFAULT_MAX_ITEMS,
+            priority=priority
+        )
+
+    def search_products(self, product_name, options=None, run_stats=None):
         """
-        Base implementation for searching products across marketplaces
+        Base implementation for searching products across marketplaces.
+        When a `run_stats` dict is given, the actor run time (excluding queueing for
+        a run slot) is stored in it as 'run_seconds'.
         """
+        options = options or self.resolve_options()
         try:
             # Get actor-specific input
-            run_input = self._prepare_actor_input(product_name)
+            run_input = self._prepare_actor_input(product_name, options)
             
-            # Run the Actor and wait for it to finish
+            # Start the Actor, then wait for that run to finish. Only start() is retried:
+            # retrying a start-and-wait call after the run began would launch a second billed run
             logger.debug(f"Starting Apify actor run for {self.actor_id}...")
-            run = self.client.actor(self.actor_id).call(run_input=run_input)
-            
-            products = []
+            with self.governor.run_slot(options.priority):
+                started = time.monotonic()
+                run = self.governor.call(self.client.actor(self.actor_id).start, run_input=run_input)
+                run_client = self.client.run(run['id'])
+                run = self.governor.call(run_client.wait_for_finish, wait_secs=settings.APIFY_RUN_TIMEOUT)
+                measured = time.monotonic() - started
+            if not run or run.get('status') != 'SUCCEEDED':
+                raise Exception(f"Actor run finished with status {run.get('status') if run else 'unknown'}")
+            if run_stats is not None:
+                run_stats['run_seconds'] = self._run_seconds(run, measured)
+
             logger.debug("Processing search results...")
-            for item in self.client.dataset(run["defaultDatasetId"]).iterate_items():
-                try:
-                    product = self._process_item(item)
-                    if product:
-                        products.append(product)
-                except Exception as e:
-                    logger.debug(f"Error processing product data: {str(e)}")
-                    continue
+            items = self._fetch_items(run["defaultDatasetId"])
+            with self.profiler.session(f"normalize_{type(self).__name__}"):
+                products = process_pool.normalize_in_pool(self, items, options)
+                if products is None:
+                    products = list(self._iter_products(items, options))
 
             logger.info(f"Found {len(products)} products from {self.actor_id}")
             return products
 
+        except ApifyQuotaError:
+            logger.error(f"Apify limits still exceeded for {self.actor_id}")
+            raise
         except httpx.HTTPError as e:
             logger.error(f"HTTP error occurred: {str(e)}")
             raise Exception(f"Failed to fetch products: {str(e)}")
@@ -56,14 +119,112 @@ class MarketplaceClient(ABC):
             logger.error(f"Error searching products: {str(e)}")
             raise Exception(f"An error occurred while searching products: {str(e)}")
 
-    def _process_review_data(self, item):
+    async def search_products_async(self, product_name, run_waiter, options=None, run_stats=None):
         """
-        Process review-related data from an item.
-        This method can be extended later to include AI-powered review analysis.
+        Same as search_products, but the actor run is started without waiting and the
+        search resumes when `run_waiter` receives the run's completion webhook.
         """
-        review_data = {
-            'rating': float(item.get('rating') or item.get('stars', 0) or 0),
-            'reviews_count': int(item.get('reviewsCount') or item.get('numberOfReviews', 0) or 0),
-            'review_analysis': None  # Placeholder for future AI analysis
-        }
-        return review_data
+        options = options or self.resolve_options()
+        try:
+            run_input = self._prepare_actor_input(product_name, options)
+
+            logger.debug(f"Starting Apify actor run for {self.actor_id} (webhook mode)...")
+            async with self.governor.run_slot_async(options.priority):
+                started = time.monotonic()
+                run = await self.governor.call_async(
+                    self.async_client.actor(self.actor_id).start,
+                    run_input=run_input, webhooks=run_waiter.webhooks()
+                )
+                run_client = self.async_client.run(run['id'])
+                run = await run_waiter.wait(
+                    run['id'], poll=lambda: self.governor.call_async(run_client.get)
+                )
+                measured = time.monotonic() - started
+            if run.get('status') != 'SUCCEEDED':
+                raise Exception(f"Actor run {run.get('id')} finished with status {run.get('status')}")
+            if not run.get('defaultDatasetId'):
+                run = await self.governor.call_async(run_client.get)
+            if run_stats is not None:
+                run_stats['run_seconds'] = self._run_seconds(run, measured)
+
+            logger.debug("Processing search results...")
+            items = await self._fetch_items_async(run["defaultDatasetId"])
+            with self.profiler.session(f"normalize_{type(self).__name__}"):
+                products = await process_pool.normalize_in_pool_async(self, items, options)
+                if products is None:
+                    products = list(self._iter_products(items, options))
+
+            logger.info(f"Found {len(products)} products from {self.actor_id}")
+            return products
+
+        except ApifyQuotaError:
+            logger.error(f"Apify limits still exceeded for {self.actor_id}")
+            raise
+        except httpx.HTTPError as e:
+            logger.error(f"HTTP error occurred: {str(e)}")
+            raise Exception(f"Failed to fetch products: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error searching products: {str(e)}")
+            raise Exception(f"An error occurred while searching products: {str(e)}")
+
+    @staticmethod
+    def _run_seconds(run, measured):
+        """Actor run time from the run's startedAt/finishedAt, else the time measured around it"""
+        started, finished = run.get('startedAt'), run.get('finishedAt')
+        try:
+            if isinstance(started, str):
+                started = datetime.fromisoformat(started.replace('Z', '+00:00'))
+            if isinstance(finished, str):
+                finished = datetime.fromisoformat(finished.replace('Z', '+00:00'))
+            return max(0.0, (finished - started).total_seconds())
+        except (TypeError, ValueError):
+            return measured
+
+    def _iter_products(self, items, options):
+        """Normalizes dataset items one at a time, skipping the ones that cannot be processed"""
+        process_item = self._process_item
+        skipped = 0
+        for item in items:
+            try:
+                product = process_item(item, options)
+            except Exception as e:
+                logger.debug(f"Error processing product data: {str(e)}")
+                continue
+            if product:
+                yield product
+            else:
+                skipped += 1
+        if skipped:
+            logger.debug(f"Skipped {skipped} {self.actor_id} items missing a title or URL")
+
+    def _fetch_items(self, dataset_id):
+        """
+        Downloads the dataset items of a finished run.
+        In projected mode only DATASET_FIELDS are requested, in a single bulk request
+        (the HTTP client negotiates gzip), instead of paging through full item JSON.
+        """
+        dataset = self.client.dataset(dataset_id)
+        if settings.DATASET_FETCH_MODE == 'projected' and self.DATASET_FIELDS:
+            raw = self.governor.call(
+                dataset.get_items_as_bytes,
+                item_format='json',
+                fields=list(self.DATASET_FIELDS),
+                skip_empty=True
+            )
+            return json.loads(raw) if raw else []
+        self.governor.throttle()
+        return dataset.iterate_items()
+
+    async def _fetch_items_async(self, dataset_id):
+        """Async counterpart of _fetch_items; returns a list of items"""
+        dataset = self.async_client.dataset(dataset_id)
+        if settings.DATASET_FETCH_MODE == 'projected' and self.DATASET_FIELDS:
+            raw = await self.governor.call_async(
+                dataset.get_items_as_bytes,
+                item_format='json',
+                fields=list(self.DATASET_FIELDS),
+                skip_empty=True
+            )
+            return json.loads(raw) if raw else []
+        await self.governor.throttle_async()
+        return [item async for item in dataset.iterate_items()]
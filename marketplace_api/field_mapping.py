@@ -0,0 +1,218 @@
+"""
+Declarative dataset-item -> product mappings.
+
+Each client describes its product fields as a FieldMapping. The mapping is
+compiled once, when the client class is defined, into a flat extractor function
+equivalent to a hand-written `item.get(...) or item.get(...)` cascade, so there
+is no per-item interpretation of the schema.
+"""
+from string import Formatter
+
+
+class Template:
+    """
+    URL (or other string) built from item fields, e.g.
+    Template("https://www.temu.com/product/{id}.html", id=('id', 'productId')).
+    `{region}` is the search region; every other placeholder needs a truthy item field.
+    """
+
+    def __init__(self, pattern, **placeholders):
+        self.pattern = pattern
+        names = {name for _, name, _, _ in Formatter().parse(pattern) if name}
+        missing = names - set(placeholders) - {'region'}
+        if missing:
+            raise ValueError(f"No item fields given for placeholders {sorted(missing)} in {pattern!r}")
+        self.placeholders = {
+            name: (keys,) if isinstance(keys, str) else tuple(keys)
+            for name, keys in placeholders.items()
+        }
+
+
+class PriceRange:
+    """Price from a low/high pair: '$5' when they match (or one is missing), else '$5-$9'"""
+
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+
+
+class Field:
+    """
+    One product field: the first truthy source not listed in `missing` wins.
+
+    Args:
+        sources: item keys, Template or PriceRange, tried in order
+        unwrap: key to read when a source value is a dict (e.g. {'value': 9.99})
+        missing: placeholder values treated as absent (e.g. ('N/A',)), so the next source is tried
+        coerce: 'float', 'int', 'count' or 'dollar', applied to a found value
+        default: value used when no source matches
+        required: skip the item when no source matches
+        optional: leave the field out when no source matches
+    """
+
+    def __init__(self, *sources, unwrap=None, missing=(), coerce=None, default=None, required=False,
+                 optional=False):
+        if coerce is not None and coerce not in COERCIONS:
+            raise ValueError(f"Unknown coercion {coerce!r}")
+        self.sources = sources
+        self.unwrap = unwrap
+        self.missing = tuple(missing)
+        self.coerce = coerce
+        self.default = default
+        self.required = required
+        self.optional = optional
+
+
+def _to_count(value):
+    if isinstance(value, list):
+        return len(value)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _price_range(low, high):
+    if low is None or high is None or low == high:
+        return f"${high if low is None else low}"
+    return f"${low}-${high}"
+
+
+def _f_string(pattern, names):
+    """Rewrites a str.format pattern as an f-string over the given variable names"""
+    parts = []
+    for literal, field, spec, conversion in Formatter().parse(pattern):
+        parts.append(literal.replace('{', '{{').replace('}', '}}'))
+        if field is not None:
+            parts.append('{' + names[field] + (f"!{conversion}" if conversion else '') + (f":{spec}" if spec else '') + '}')
+    return 'f' + repr(''.join(parts))
+
+
+def _literal(value, name, namespace):
+    """Source for a constant: inlined when it is a plain literal, else bound into the namespace"""
+    if value is None or type(value) in (bool, int, float, str):
+        return repr(value)
+    namespace[name] = value
+    return name
+
+
+# Coercions applied to a found value, emitted inline into compiled extractors
+COERCIONS = {
+    'float': lambda var: [
+        "try:", f"    {var} = float({var})", "except (TypeError, ValueError):", f"    {var} = 0.0"
+    ],
+    'int': lambda var: [
+        "try:", f"    {var} = int({var})", "except (TypeError, ValueError):", f"    {var} = 0"
+    ],
+    'count': lambda var: [f"{var} = _to_count({var})"],
+    'dollar': lambda var: [
+        f"if {var}.__class__ is not str or {var}[0] != '$': {var} = '$' + str({var})"
+    ],
+}
+
+
+class FieldMapping:
+    """Ordered product fields; plain (non-Field) values are constants"""
+
+    def __init__(self, fields):
+        self.fields = dict(fields)
+
+    @property
+    def source_fields(self):
+        """Every item key the mapping reads, for projected dataset downloads"""
+        keys = []
+        for spec in self.fields.values():
+            if not isinstance(spec, Field):
+                continue
+            for source in spec.sources:
+                if isinstance(source, str):
+                    keys.append(source)
+                elif isinstance(source, PriceRange):
+                    keys += [source.low, source.high]
+                else:
+                    keys += [key for group in source.placeholders.values() for key in group]
+        return tuple(dict.fromkeys(keys))
+
+    def compile(self, name='extract'):
+        """
+        Generates and returns `name(self, item, options) -> dict | None`; `self` is
+        unused, so the function can be assigned directly as a client method.
+        """
+        namespace = {'_price_range': _price_range, '_to_count': _to_count}
+        lines = [f"def {name}(self, item, options):", "    get = item.get"]
+        result = []
+        optional = []
+
+        for index, (key, spec) in enumerate(self.fields.items()):
+            var = f"f{index}"
+            if not isinstance(spec, Field):
+                result.append(f"{key!r}: {_literal(spec, f'c{index}', namespace)}")
+                continue
+
+            for position, source in enumerate(spec.sources):
+                body = self._source_lines(var, source, spec.unwrap, namespace, f"{index}_{position}")
+                if spec.missing:
+                    body.append(f"if {var} in {spec.missing!r}: {var} = None")
+                if position == 0:
+                    lines += [f"    {line}" for line in body]
+                else:
+                    lines.append(f"    if not {var}:")
+                    lines += [f"        {line}" for line in body]
+
+            coerce = [f"        {line}" for line in COERCIONS[spec.coerce](var)] if spec.coerce else []
+            if spec.required:
+                lines.append(f"    if not {var}: return None")
+                lines += [line[4:] for line in coerce]
+            elif spec.optional:
+                if coerce:
+                    lines.append(f"    if {var}:")
+                    lines += coerce
+                optional.append((key, var))
+                continue
+            else:
+                default = _literal(spec.default, f"d{index}", namespace)
+                if coerce:
+                    lines.append(f"    if {var}:")
+                    lines += coerce
+                    lines.append("    else:")
+                    lines.append(f"        {var} = {default}")
+                else:
+                    lines.append(f"    if not {var}: {var} = {default}")
+            result.append(f"{key!r}: {var}")
+
+        lines.append(f"    product = {{{', '.join(result)}}}")
+        for key, var in optional:
+            lines.append(f"    if {var}: product[{key!r}] = {var}")
+        lines.append("    return product")
+
+        source = "\n".join(lines) + "\n"
+        exec(compile(source, f"<field mapping {name}>", "exec"), namespace)
+        extractor = namespace[name]
+        extractor.source = source
+        return extractor
+
+    @staticmethod
+    def _source_lines(var, source, unwrap, namespace, suffix):
+        if isinstance(source, str):
+            lines = [f"{var} = get({source!r})"]
+        elif isinstance(source, PriceRange):
+            lo, hi = f"lo{suffix}", f"hi{suffix}"
+            lines = [
+                f"{lo} = get({source.low!r}); {hi} = get({source.high!r})",
+                f"{var} = None if {lo} is None and {hi} is None else _price_range({lo}, {hi})",
+            ]
+            return lines
+        else:
+            lines = []
+            names = {'region': 'options.region'}
+            for position, (placeholder, keys) in enumerate(source.placeholders.items()):
+                names[placeholder] = f"t{suffix}_{position}"
+                lines.append(f"{names[placeholder]} = {' or '.join(f'get({key!r})' for key in keys)}")
+            temps = [name for placeholder, name in names.items() if placeholder != 'region']
+            lines.append(
+                f"{var} = {_f_string(source.pattern, names)} if {' and '.join(temps) or 'True'} else None"
+            )
+            return lines
+        if unwrap is not None:
+            lines.append(f"if {var}.__class__ is dict: {var} = {var}.get({unwrap!r})")
+        return lines
@@ -1,239 +1,98 @@
 import logging
-import json
 from .base_client import MarketplaceClient
+from .field_mapping import Field, FieldMapping, PriceRange, Template
 
 logger = logging.getLogger(__name__)
 
+TITLE_FIELDS = ('title', 'name', 'productName', 'product_name')
+
 class TemuClient(MarketplaceClient):
+    # Review arrays are not downloaded; the count comes from reviewsCount
+    FIELD_MAP = FieldMapping({
+        'title': Field(*TITLE_FIELDS, required=True),
+        'price': Field('price', 'salePrice', 'originalPrice', unwrap='value', missing=('N/A',), coerce='dollar',
+                       default='N/A'),
+        'url': Field('url', 'productUrl', 'link', 'link_url',
+                     Template("https://www.temu.com/product/{id}.html", id=('id', 'productId')),
+                     required=True),
+        'marketplace': 'Temu',
+        'rating': Field('rating', unwrap='value', coerce='float', default=0),
+        'review_count': Field('reviewsCount', coerce='count', default=0),
+        'shipping': Field('shipping', unwrap='deliveryDays', default='N/A'),
+        'seller': 'Temu seller',
+    })
+
     def __init__(self):
         super().__init__("LTBzVVq592mKgR6lU")
 
-    def _prepare_actor_input(self, search_query):
+    def _prepare_actor_input(self, search_query, options):
         return {
             "searchQueries": [search_query],
-            "maxItems": 20,
-            "getReviews": True,
+            "maxItems": options.max_items,
+            "getReviews": False,
             "saveImages": False,
             "saveVideos": False
         }
 
-    def _process_item(self, item):
-        # Debug the item structure
-        logger.debug(f"Processing Temu item: {json.dumps(item, indent=2)}")
-        
-        # Get the title from various possible fields
-        title = (item.get('title') or 
-                item.get('name') or 
-                item.get('productName') or
-                item.get('product_name') or
-                '')
-                
-        if not title:
-            logger.debug("Skipping Temu product with no title")
-            return None
-
-        # Get price information
-        price = item.get('price')
-        if isinstance(price, dict):
-            price = price.get('value', 'N/A')
-        if not price or price == 'N/A':
-            price = item.get('salePrice', {}).get('value') or item.get('originalPrice', {}).get('value')
-        if price is None:
-            price = 'N/A'
-        else:
-            price = f"${price}" if not str(price).startswith('$') else str(price)
-
-        # Get product URL
-        url = (item.get('url') or 
-               item.get('productUrl') or
-               item.get('link') or
-               item.get('link_url') or
-               '')
-               
-        if not url and (product_id := (item.get('id') or item.get('productId'))):
-            url = f"https://www.temu.com/product/{product_id}.html"
-        
-        if not url:
-            logger.debug(f"Skipping Temu product missing URL: {title}")
-            return None
-
-        # Process review information
-        rating = 0
-        review_count = 0
-        
-        if isinstance(item.get('rating'), dict):
-            rating = float(item['rating'].get('value', 0))
-        elif isinstance(item.get('rating'), (int, float)):
-            rating = float(item['rating'])
-            
-        if 'reviews' in item and isinstance(item['reviews'], list):
-            review_count = len(item['reviews'])
-        elif 'reviewsCount' in item:
-            review_count = int(item['reviewsCount'])
-
-        shipping = 'N/A'
-        if 'shipping' in item:
-            if isinstance(item['shipping'], dict):
-                shipping = item['shipping'].get('deliveryDays', 'N/A')
-            elif isinstance(item['shipping'], str):
-                shipping = item['shipping']
-
-        return {
-            'title': title,
-            'price': price,
-            'url': url,
-            'marketplace': 'Temu',
-            'rating': rating,
-            'review_count': review_count,
-            'shipping': shipping,
-            'seller': 'Temu seller'
-        }
-
 class JumiaClient(MarketplaceClient):
-    def __init__(self):
-        super().__init__("easyapi/jumia-product-scraper")
-
-    def _prepare_actor_input(self, search_query):
+    FIELD_MAP = FieldMapping({
+        'title': Field('name', 'productName', 'displayName', 'product_name', required=True),
+        'price': Field('prices', default='N/A'),
+        'url': Field('url', required=True),
+        'marketplace': 'Jumia',
+        'rating': Field('rating', 'stars', coerce='float', default=0.0),
+        'reviews_count': Field('reviewsCount', 'numberOfReviews', coerce='int', default=0),
+        'review_analysis': None,
+    })
+
+    def __init__(self, country="kenya"):
+        super().__init__("easyapi/jumia-product-scraper", default_region=country)
+
+    def _prepare_actor_input(self, search_query, options):
         return {
             "searchUrls": search_query,
-            "maxProducts": 20,
-            "country": "kenya"
-        }
-
-    def _process_item(self, item):
-        title = (item.get('name') or 
-                 item.get('productName') or 
-                 item.get('displayName') or
-                 item.get('product_name') or 
-                 '')
-        if not title:
-            logger.debug("Skipping Jumia product with no title")
-            return None
-
-        price = item.get('prices', 'N/A')
-        url = item.get('url', '')
-
-        if not url:
-            logger.debug(f"Skipping Jumia product missing URL: {title}")
-            return None
-
-        review_data = self._process_review_data(item)
-
-        return {
-            'title': title,
-            'price': price,
-            'url': url,
-            'marketplace': 'Jumia',
-            **review_data
+            "maxProducts": options.max_items,
+            "country": options.region
         }
 
 class AlibabaClient(MarketplaceClient):
+    # Alibaba often has price ranges
+    FIELD_MAP = FieldMapping({
+        'title': Field(*TITLE_FIELDS, required=True),
+        'price': Field(PriceRange('minPrice', 'maxPrice'), 'price'),
+        'url': Field('productUrl', required=True),
+        'marketplace': 'Alibaba',
+        'rating': Field('reviewScore', optional=True),
+        'reviews_count': Field('reviewCount', optional=True),
+    })
+
     def __init__(self):
         super().__init__("piotrv1001/alibaba-listings-scraper")
 
-    def _prepare_actor_input(self, search_query):
+    def _prepare_actor_input(self, search_query, options):
         return {
             "search": search_query,
-            "maxItems": 20,
+            "maxItems": options.max_items,
             "minOrders": 0
         }
 
-    def _process_item(self, item):
-        title = (item.get('title') or 
-                 item.get('name') or 
-                 item.get('productName') or 
-                 item.get('product_name') or 
-                 '')
-        if not title:
-            logger.debug("Skipping Alibaba product with no title")
-            return None
-
-        # Alibaba often has price ranges
-        min_price = item.get('minPrice')
-        max_price = item.get('maxPrice')
-        if min_price is None and max_price is None:
-            price = item.get('price')
-        else:
-            price = f"${min_price}" if min_price == max_price else f"${min_price}-${max_price}"
-
-        url = item.get('productUrl', '')
-
-        if not url:
-            logger.debug(f"Skipping Alibaba product missing URL: {title}")
-            return None
-
-        reviewScore = item.get('reviewScore', 0)
-        reviewCount = item.get('reviewCount', 0)
-        review_data = {'rating': reviewScore, 'reviews_count': reviewCount} if reviewScore and reviewCount else {}
-        # review_data = self._process_review_data(item)
-
-        return {
-            'title': title,
-            'price': price,
-            'url': url,
-            'marketplace': 'Alibaba',
-            **review_data
-        }
-
 class AliExpressClient(MarketplaceClient):
+    FIELD_MAP = FieldMapping({
+        'title': Field(*TITLE_FIELDS, required=True),
+        'price': Field('price', 'salePrice', 'originalPrice', missing=('N/A',), coerce='dollar', default='N/A'),
+        'url': Field('productUrl', 'url', required=True),
+        'marketplace': 'AliExpress',
+        'rating': Field('rating', coerce='float', default=0),
+        'review_count': Field('reviewCount', 'reviews', coerce='int', default=0),
+        'shipping': Field('shipping', unwrap='time', default='N/A'),
+        'seller': Field('store', unwrap='name', default='AliExpress seller'),
+    })
+
     def __init__(self):
         super().__init__("epctex/aliexpress-scraper")
 
-    def _prepare_actor_input(self, search_query):
+    def _prepare_actor_input(self, search_query, options):
         return {
             "startUrls": [f"https://www.aliexpress.com/wholesale?SearchText={search_query.replace(' ', '+')}"],
-            "maxItems": 20
+            "maxItems": options.max_items
         }
-    def _process_item(self, item):
-        title = (item.get('title') or 
-                 item.get('name') or 
-                 item.get('productName') or 
-                 item.get('product_name') or 
-                 '')
-        if not title:
-            logger.debug("Skipping AliExpress product with no title")
-            return None
-
-        # Handle price
-        price = item.get('price')
-        if not price:
-            price = item.get('salePrice') or item.get('originalPrice') or 'N/A'
-        
-        if price != 'N/A' and not str(price).startswith('$'):
-            price = f"${price}"
-
-        url = item.get('productUrl') or item.get('url') or ''
-        if not url:
-            logger.debug(f"Skipping AliExpress product missing URL: {title}")
-            return None
-
-        # Process rating and reviews
-        rating = item.get('rating', 0)
-        if isinstance(rating, str):
-            try:
-                rating = float(rating)
-            except ValueError:
-                rating = 0
-
-        review_count = item.get('reviewCount', 0) or item.get('reviews', 0)
-        if isinstance(review_count, str):
-            try:
-                review_count = int(review_count)
-            except ValueError:
-                review_count = 0
-
-        # Handle shipping
-        shipping = item.get('shipping', 'N/A')
-        if isinstance(shipping, dict):
-            shipping = shipping.get('time', 'N/A')
-
-        return {
-            'title': title,
-            'price': price,
-            'url': url,
-            'marketplace': 'AliExpress',
-            'rating': rating,
-            'review_count': review_count,
-            'shipping': shipping,
-            'seller': item.get('store', {}).get('name', 'AliExpress seller') if isinstance(item.get('store'), dict) else 'AliExpress seller'
-        }
\ No newline at end of file
@@ -1,7 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import contextvars
 from typing import List, Dict, Any
 import logging
+from config import settings
 from .amazon_client import AmazonClient
 from .marketplace_clients import TemuClient, JumiaClient, AlibabaClient, AliExpressClient
+from . import process_pool
+from .product_index import ProductIndex
+from .quota_governor import PRIORITY_MULTI, PRIORITY_SINGLE
+from .result_budget import ResultBudget
+from .result_cache import ResultCache
+from .run_webhooks import ApifyRunWaiter
+from utils import ranking
+from utils.dedup import group_duplicate_listings
+from utils.query_normalizer import normalize_query
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +28,13 @@ class MarketplaceManager:
         'aliexpress': 'AliExpress'
     }
 
-    def __init__(self):
+    # Regions searched by the multi-region fan-out
+    MARKETPLACE_REGIONS = {
+        'amazon': settings.AMAZON_REGIONS,
+        'jumia': settings.JUMIA_COUNTRIES
+    }
+
+    def __init__(self, use_local_index: bool = None):
         self.clients = {
             'amazon': AmazonClient(),
             'temu': TemuClient(),
@@ -22,7 +42,35 @@ class MarketplaceManager:
             'alibaba': AlibabaClient(),
             'aliexpress': AliExpressClient()
         }
+        self.result_cache = ResultCache()
+        self.result_budget = ResultBudget()
+        # Local index mode: answer from previously fetched products when enough fresh ones match
+        if use_local_index is None:
+            use_local_index = settings.PRODUCT_INDEX_ENABLED
+        self.product_index = ProductIndex() if use_local_index else None
+        # Webhook mode: actor runs are awaited through completion webhooks (see start())
+        self.run_waiter = ApifyRunWaiter() if settings.APIFY_WEBHOOK_ENABLED else None
+        # Blocking actor runs hold a thread for minutes, so they get their own executor and
+        # never starve asyncio.to_thread users; index lookups get a small one of their own
+        self.search_executor = ThreadPoolExecutor(
+            max_workers=settings.SEARCH_WORKER_THREADS, thread_name_prefix="marketplace-search"
+        )
+        self.lookup_executor = ThreadPoolExecutor(
+            max_workers=settings.INDEX_LOOKUP_THREADS, thread_name_prefix="index-lookup"
+        )
     
+    async def start(self):
+        """Starts the webhook endpoint when webhook mode is enabled"""
+        if self.run_waiter is not None:
+            await self.run_waiter.start()
+
+    async def stop(self):
+        if self.run_waiter is not None:
+            await self.run_waiter.stop()
+        self.search_executor.shutdown(wait=False, cancel_futures=True)
+        self.lookup_executor.shutdown(wait=False, cancel_futures=True)
+        process_pool.shutdown_process_pool()
+
     def get_available_marketplaces(self):
         """Returns a list of available marketplace identifiers"""
         return list(self.clients.keys())
@@ -31,7 +79,12 @@ class MarketplaceManager:
         """Get the display name for a marketplace"""
         return self.MARKETPLACE_NAMES.get(marketplace, marketplace.title())
 
-    def search_marketplace(self, marketplace: str, product_name: str, region: str = None) -> List[Dict[str, Any]]:
+    def get_marketplace_regions(self, marketplace: str) -> List[str]:
+        """Regions (or countries) a marketplace can be searched in; empty if it has none"""
+        return list(self.MARKETPLACE_REGIONS.get(marketplace, []))
+
+    def search_marketplace(self, marketplace: str, product_name: str, region: str = None,
+                           max_items: int = None, priority: int = PRIORITY_SINGLE, fetch_stats: dict = None) -> List[Dict[str, Any]]:
         """
         Search for products in a specific marketplace
         
@@ -39,53 +92,342 @@ class MarketplaceManager:
             marketplace (str): The marketplace identifier ('amazon', 'temu', etc.)
             product_name (str): The product to search for
             region (str, optional): Region for region-specific marketplaces like Amazon
+            max_items (int, optional): Explicit item count (e.g. "show more"), bypassing
+                the adaptive budget and the cache
+            priority (int, optional): Apify run priority (see quota_governor)
+            fetch_stats (dict, optional): Filled with 'item_count', the maxItems the
+                results were fetched with (None if unknown), e.g. to tell whether
+                fetching more could find anything
             
         Returns:
             List[Dict[str, Any]]: List of products found
         """
+        query, region, namespace = self._resolve_search(marketplace, product_name, region)
+        if not query:
+            return []
+        if max_items is None:
+            results = self._from_cache(marketplace, query, namespace, fetch_stats)
+            if results is None:
+                results = self._from_index(marketplace, query, region, namespace, fetch_stats)
+            if results is not None:
+                return results
+
+        plan = self._plan_search(marketplace, product_name, query, region, namespace, max_items, priority)
+        if fetch_stats is not None:
+            fetch_stats['item_count'] = plan['options'].max_items
+        client = self.clients[marketplace]
+        results = client.search_products(
+            plan['search_query'], options=plan['options'], run_stats=plan['run_stats']
+        )
+        return self._finish_search(plan, results)
+
+    async def search_marketplace_async(self, marketplace: str, product_name: str, region: str = None,
+                                       max_items: int = None, priority: int = PRIORITY_SINGLE,
+                                       fetch_stats: dict = None) -> List[Dict[str, Any]]:
+        """
+        Async version of search_marketplace. The in-memory cache is read on the event
+        loop and the SQLite index in its own small executor. In webhook mode the actor
+        run is awaited through its completion webhook without holding a thread;
+        otherwise the blocking actor run holds a thread of the search executor, never
+        one of the default executor.
+        """
+        loop = asyncio.get_running_loop()
+        query, region, namespace = self._resolve_search(marketplace, product_name, region)
+        if not query:
+            return []
+        if max_items is None:
+            results = self._from_cache(marketplace, query, namespace, fetch_stats)
+            if results is None and self.product_index is not None:
+                results = await loop.run_in_executor(
+                    self.lookup_executor, self._from_index, marketplace, query, region, namespace, fetch_stats
+                )
+            if results is not None:
+                return results
+
+        plan = self._plan_search(marketplace, product_name, query, region, namespace, max_items, priority)
+        if fetch_stats is not None:
+            fetch_stats['item_count'] = plan['options'].max_items
+        client = self.clients[marketplace]
+        if self.run_waiter is None:
+            # Carry the caller's context (e.g. its profiling decision) into the worker thread
+            results = await loop.run_in_executor(self.search_executor, partial(
+                contextvars.copy_context().run, client.search_products, plan['search_query'],
+                options=plan['options'], run_stats=plan['run_stats']
+            ))
+        else:
+            results = await client.search_products_async(
+                plan['search_query'], self.run_waiter, options=plan['options'], run_stats=plan['run_stats']
+            )
+        return self._finish_search(plan, results)
+
+    def _resolve_search(self, marketplace, product_name, region):
+        """(canonical query, resolved region, cache namespace) of a search"""
         if marketplace not in self.clients:
             raise ValueError(f"Unknown marketplace: {marketplace}")
-        
-        client = self.clients[marketplace]
-        # Handle region for Amazon specifically
-        if marketplace == 'amazon' and region:
-            client.region = region
-            
-        if marketplace == 'temu' and region:
-            client.region = region
+        # Resolve the region once, so the default region and an explicit one share cache entries
+        region = self.clients[marketplace].resolve_options(region).region
+        return normalize_query(product_name), region, self._cache_namespace(marketplace, region)
 
-        if marketplace == 'jumia' and region:
-            client.region = region
+    def _from_cache(self, marketplace, query, namespace, fetch_stats=None):
+        """Cached results of a search, or None; in memory only, so safe on the event loop"""
+        cache_stats = {}
+        cached = self.result_cache.get(namespace, query, stats=cache_stats)
+        if cached is None:
+            return None
+        logger.info(f"Serving '{query}' on {marketplace} from cache")
+        if fetch_stats is not None:
+            fetch_stats['item_count'] = cache_stats.get('item_count')
+        return cached
 
-        if marketplace == 'alibaba' and region:
-            client.region = region
+    def _from_index(self, marketplace, query, region, namespace, fetch_stats=None):
+        """Results of a search from the local index (cached for next time), or None; blocks on SQLite"""
+        indexed = self._search_local_index(marketplace, query, region)
+        if indexed is None:
+            return None
+        logger.info(f"Serving '{query}' on {marketplace} from the local product index")
+        # The index is read up to the full budget, like a full-size actor run
+        item_count = self.result_budget.max_items
+        self.result_cache.put(namespace, query, indexed, item_count)
+        if fetch_stats is not None:
+            fetch_stats['item_count'] = item_count
+        return indexed
 
-        if marketplace == 'aliexpress' and region:
-            client.region = region
+    def _plan_search(self, marketplace, product_name, query, region, namespace, max_items, priority):
+        """Describes the actor run to make for a search the cache and index could not answer"""
+        item_count = max_items or self.result_budget.items_for(marketplace, query)
+        return {
+            'marketplace': marketplace,
+            'query': query,
+            # The actor gets the user's own text; the canonical query is only a key
+            'search_query': product_name.strip(),
+            'region': region,
+            'namespace': namespace,
+            'options': self.clients[marketplace].resolve_options(region, item_count, priority),
+            'explicit_max_items': max_items is not None,
+            # Filled by the client with the actor run time, without slot or thread queueing
+            'run_stats': {},
+        }
 
-        results = client.search_products(product_name)
+    def _finish_search(self, plan, results):
+        """Labels fresh actor results and feeds them to the index, budget and cache"""
+        marketplace, region = plan['marketplace'], plan['region']
         # Add marketplace name to each result
         for result in results:
             result['marketplace'] = self.get_marketplace_display_name(marketplace)
+            if region:
+                result['region'] = region
+
+        if self.product_index is not None:
+            self.product_index.add(marketplace, region, results)
+
+        if not plan['explicit_max_items']:
+            self.result_budget.record(
+                marketplace, plan['query'], self._best_rank(results), plan['options'].max_items,
+                plan['run_stats'].get('run_seconds')
+            )
+
+        self.result_cache.put(plan['namespace'], plan['query'], results, plan['options'].max_items)
+        return results
+
+    @staticmethod
+    def _cache_namespace(marketplace: str, region: str = None) -> str:
+        return f"{marketplace}:{region or ''}"
+
+    def _search_local_index(self, marketplace: str, query: str, region: str = None):
+        """Fresh matching products from the local index, or None if there are too few of them"""
+        if self.product_index is None:
+            return None
+        products = self.product_index.search(
+            marketplace, query, region=region, limit=self.result_budget.max_items
+        )
+        if len(products) < settings.PRODUCT_INDEX_MIN_RESULTS:
+            return None
+        return products
+
+    def get_cached_results(self, product_name: str, region: str = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Returns already cached or locally indexed results for a query without calling
+        any marketplace
         
+        Args:
+            product_name (str): The product to search for
+            region (str, optional): Region for region-specific marketplaces like Amazon
+            
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: Cached products per marketplace; marketplaces
+                without cached or indexed results are left out
+        """
+        results, missing = self._cached_results(product_name, region)
+        results.update(self._indexed_results(missing))
+        return results
+
+    async def get_cached_results_async(self, product_name: str, region: str = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Async version of get_cached_results: the cache is read on the loop, the index in its executor"""
+        results, missing = self._cached_results(product_name, region)
+        if missing:
+            results.update(await asyncio.get_running_loop().run_in_executor(
+                self.lookup_executor, self._indexed_results, missing
+            ))
         return results
 
-    def search_all_marketplaces(self, product_name: str) -> Dict[str, List[Dict[str, Any]]]:
+    def _cached_results(self, product_name, region):
+        """Cached products per marketplace, and (marketplace, query, region) of the ones not cached"""
+        query = normalize_query(product_name)
+        if not query:
+            return {}, []
+        results = {}
+        missing = []
+        for marketplace, client in self.clients.items():
+            marketplace_region = client.resolve_options(region).region
+            cached = self.result_cache.get(self._cache_namespace(marketplace, marketplace_region), query)
+            if cached:
+                results[marketplace] = cached
+            elif cached is None and self.product_index is not None:
+                missing.append((marketplace, query, marketplace_region))
+        return results, missing
+
+    def _indexed_results(self, searches):
+        """Locally indexed products per marketplace for (marketplace, query, region) searches"""
+        results = {}
+        for marketplace, query, region in searches:
+            indexed = self._search_local_index(marketplace, query, region)
+            if indexed:
+                results[marketplace] = indexed
+        return results
+
+    @staticmethod
+    def _best_rank(results: List[Dict[str, Any]]):
+        """Position of the product the bot would show (highest rating), or None"""
+        if not results:
+            return None
+        return max(range(len(results)), key=lambda i: ranking.rating_score(results[i]))
+
+    def search_regions(self, marketplace: str, product_name: str, regions: List[str] = None,
+                       priority: int = PRIORITY_MULTI, max_items: int = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Search one marketplace in several regions in parallel
+        
+        Args:
+            marketplace (str): A marketplace with regions ('amazon', 'jumia')
+            product_name (str): The product to search for
+            regions (List[str], optional): Regions to search; defaults to all known regions
+            priority (int, optional): Apify run priority (see quota_governor)
+            max_items (int, optional): Explicit item count per region (see search_marketplace)
+            
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: Dictionary mapping regions to lists of products
+        """
+        regions = regions or self.get_marketplace_regions(marketplace)
+        if not regions:
+            raise ValueError(f"Marketplace {marketplace} has no regions")
+
+        results = {}
+        # Each region is its own request with its own options, so the runs share nothing
+        with ThreadPoolExecutor(max_workers=len(regions)) as executor:
+            futures = {
+                region: executor.submit(
+                    self.search_marketplace, marketplace, product_name, region,
+                    max_items=max_items, priority=priority
+                )
+                for region in regions
+            }
+            for region, future in futures.items():
+                try:
+                    results[region] = future.result()
+                    logger.info(f"Found {len(results[region])} products from {marketplace} ({region})")
+                except Exception as e:
+                    logger.error(f"Error searching in {marketplace} ({region}): {str(e)}")
+                    results[region] = []
+        return results
+
+    async def search_regions_async(self, marketplace: str, product_name: str, regions: List[str] = None,
+                                   priority: int = PRIORITY_MULTI, max_items: int = None,
+                                   fetch_stats: dict = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Async version of search_regions. `fetch_stats` gets the smallest 'item_count'
+        of the regions (see search_marketplace), 0 if a region failed.
+        """
+        regions = regions or self.get_marketplace_regions(marketplace)
+        if not regions:
+            raise ValueError(f"Marketplace {marketplace} has no regions")
+        region_stats = {region: {} for region in regions}
+        results = await self._gather_searches({
+            region: self.search_marketplace_async(
+                marketplace, product_name, region, max_items=max_items, priority=priority,
+                fetch_stats=region_stats[region]
+            )
+            for region in regions
+        }, label=marketplace)
+        if fetch_stats is not None:
+            fetch_stats['item_count'] = min(stats.get('item_count') or 0 for stats in region_stats.values())
+        return results
+
+    def search_all_marketplaces(self, product_name: str, priority: int = PRIORITY_MULTI,
+                                marketplaces: List[str] = None) -> Dict[str, List[Dict[str, Any]]]:
         """
         Search for products across all marketplaces
         
         Args:
             product_name (str): The product to search for
+            priority (int, optional): Apify run priority (see quota_governor)
+            marketplaces (List[str], optional): Only search these marketplaces
             
         Returns:
             Dict[str, List[Dict[str, Any]]]: Dictionary mapping marketplace names to lists of products
         """
         results = {}
-        for marketplace in self.clients.keys():
+        for marketplace in self._marketplaces(marketplaces):
             try:
-                results[marketplace] = self.search_marketplace(marketplace, product_name)
+                results[marketplace] = self.search_marketplace(marketplace, product_name, priority=priority)
                 logger.info(f"Found {len(results[marketplace])} products from {marketplace}")
             except Exception as e:
                 logger.error(f"Error searching in {marketplace}: {str(e)}")
                 results[marketplace] = []
         return results
+
+    def group_duplicate_results(self, results: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Groups the same product listed on several marketplaces (or several times on one)
+        
+        Args:
+            results (Dict[str, List[Dict[str, Any]]]): Output of search_all_marketplaces
+            
+        Returns:
+            List[Dict[str, Any]]: Distinct deals, each with its cheapest listing
+                (best rated when the group mixes currencies) under 'best'
+        """
+        all_products = [product for products in results.values() for product in products]
+        return group_duplicate_listings(all_products)
+
+    async def group_duplicate_results_async(self, results: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Async version of group_duplicate_results; large result sets are grouped in a worker process"""
+        all_products = [product for products in results.values() for product in products]
+        return await process_pool.group_duplicates_async(all_products)
+
+    async def search_all_marketplaces_async(self, product_name: str, priority: int = PRIORITY_MULTI,
+                                            marketplaces: List[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Async version of search_all_marketplaces; marketplaces are searched concurrently"""
+        return await self._gather_searches({
+            marketplace: self.search_marketplace_async(marketplace, product_name, priority=priority)
+            for marketplace in self._marketplaces(marketplaces)
+        })
+
+    def _marketplaces(self, marketplaces=None):
+        """The requested marketplaces that have a client, or all of them"""
+        if marketplaces is None:
+            return list(self.clients.keys())
+        return [marketplace for marketplace in marketplaces if marketplace in self.clients]
+
+    async def _gather_searches(self, searches, label=None):
+        """Awaits named searches together; a failed search yields an empty list"""
+        outcomes = await asyncio.gather(*searches.values(), return_exceptions=True)
+        results = {}
+        for name, outcome in zip(searches.keys(), outcomes):
+            where = f"{label} ({name})" if label else name
+            if isinstance(outcome, Exception):
+                logger.error(f"Error searching in {where}: {str(outcome)}")
+                results[name] = []
+            else:
+                results[name] = outcome
+                logger.info(f"Found {len(outcome)} products from {where}")
+        return results
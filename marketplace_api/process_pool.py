@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from config import settings
+from utils.dedup import group_duplicate_listings
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Client instances created inside each worker process, one per client class
+_worker_clients = {}
+
+
+def get_process_pool():
+    """Returns the shared worker pool, or None when the process-pool stage is disabled"""
+    global _pool
+    if not settings.PROCESS_POOL_ENABLED:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the bot process has threads (index writer, profiler) that fork would copy
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PROCESS_POOL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+
+def shutdown_process_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _use_pool(items):
+    """Large, already materialized result sets go to the pool"""
+    return (
+        isinstance(items, list)
+        and len(items) >= settings.PROCESS_POOL_THRESHOLD
+        and get_process_pool() is not None
+    )
+
+
+def _chunks(items):
+    size = settings.PROCESS_POOL_CHUNK_SIZE
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _normalize_chunk(client_class, items, options):
+    """Worker: normalizes a chunk of raw dataset items"""
+    client = _worker_clients.get(client_class)
+    if client is None:
+        client = _worker_clients[client_class] = client_class()
+    return list(client._iter_products(items, options))
+
+
+def _merge(chunk_results):
+    return [product for chunk in chunk_results for product in chunk]
+
+
+def normalize_in_pool(client, items, options):
+    """
+    Normalizes raw dataset items in worker processes, in chunks.
+    Returns None when the result set is below PROCESS_POOL_THRESHOLD (or the pool
+    is disabled), in which case the caller processes items in-process.
+    """
+    if not _use_pool(items):
+        return None
+    pool = get_process_pool()
+    logger.debug(f"Normalizing {len(items)} items from {client.actor_id} in worker processes")
+    futures = [
+        pool.submit(_normalize_chunk, type(client), chunk, options)
+        for chunk in _chunks(items)
+    ]
+    return _merge([future.result() for future in futures])
+
+
+async def normalize_in_pool_async(client, items, options):
+    """Async counterpart of normalize_in_pool; the event loop is never blocked"""
+    if not _use_pool(items):
+        return None
+    pool = get_process_pool()
+    loop = asyncio.get_running_loop()
+    logger.debug(f"Normalizing {len(items)} items from {client.actor_id} in worker processes")
+    chunk_results = await asyncio.gather(*(
+        loop.run_in_executor(pool, _normalize_chunk, type(client), chunk, options)
+        for chunk in _chunks(items)
+    ))
+    return _merge(chunk_results)
+
+
+async def group_duplicates_async(products):
+    """Groups duplicate listings, in a worker process for large result sets"""
+    if len(products) < settings.PROCESS_POOL_THRESHOLD or get_process_pool() is None:
+        return group_duplicate_listings(products)
+    return await asyncio.get_running_loop().run_in_executor(
+        get_process_pool(), group_duplicate_listings, products
+    )
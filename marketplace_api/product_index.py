@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from config import settings
+from utils.query_normalizer import query_tokens
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    marketplace TEXT NOT NULL,
+    region TEXT NOT NULL,
+    terms TEXT NOT NULL,
+    data TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS products_fetched_at ON products (fetched_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    terms, content='products', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS products_ai AFTER INSERT ON products BEGIN
+    INSERT INTO products_fts (rowid, terms) VALUES (new.id, new.terms);
+END;
+CREATE TRIGGER IF NOT EXISTS products_ad AFTER DELETE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, terms) VALUES ('delete', old.id, old.terms);
+END;
+CREATE TRIGGER IF NOT EXISTS products_au AFTER UPDATE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, terms) VALUES ('delete', old.id, old.terms);
+    INSERT INTO products_fts (rowid, terms) VALUES (new.id, new.terms);
+END;
+"""
+
+_UPSERT = """
+INSERT INTO products (url, marketplace, region, terms, data, fetched_at)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (url) DO UPDATE SET
+    marketplace = excluded.marketplace,
+    region = excluded.region,
+    terms = excluded.terms,
+    data = excluded.data,
+    fetched_at = excluded.fetched_at
+"""
+
+_SEARCH = """
+SELECT products.data FROM products_fts
+JOIN products ON products.id = products_fts.rowid
+WHERE products_fts MATCH ? AND products.marketplace = ? AND products.region = ?
+    AND products.fetched_at >= ?
+ORDER BY products_fts.rank
+LIMIT ?
+"""
+
+
+class ProductIndex:
+    """
+    Local SQLite FTS5 index of every normalized product the clients fetched.
+    Writes are queued and applied in batches by a background thread, so callers
+    (including the event loop) never wait on disk. Titles are indexed in the
+    same normalized form as queries, so "iPhone15" matches "iphone 15".
+    """
+
+    def __init__(self, path=None, batch_size=None, flush_interval=None, retention=None):
+        self.path = settings.PRODUCT_INDEX_PATH if path is None else path
+        self.batch_size = settings.PRODUCT_INDEX_BATCH_SIZE if batch_size is None else batch_size
+        self.flush_interval = (
+            settings.PRODUCT_INDEX_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        )
+        self.retention = settings.PRODUCT_INDEX_RETENTION if retention is None else retention
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="product-index-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _reader(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    def add(self, marketplace, region, products):
+        """Queues products for indexing; returns immediately"""
+        fetched_at = time.time()
+        rows = []
+        for product in products:
+            terms = ' '.join(query_tokens(product.get('title')))
+            if terms and product.get('url'):
+                rows.append((
+                    product['url'], marketplace, region or '', terms,
+                    json.dumps(product, default=str), fetched_at
+                ))
+        if rows:
+            self._queue.put(rows)
+
+    def search(self, marketplace, query, region=None, max_age=None, limit=20):
+        """
+        Returns fresh indexed products on a marketplace matching every query term,
+        best full-text match first.
+        """
+        terms = query_tokens(query)
+        if not terms:
+            return []
+        max_age = settings.PRODUCT_INDEX_MAX_AGE if max_age is None else max_age
+        match = ' '.join(f'"{term}"' for term in terms)
+        try:
+            rows = self._reader().execute(
+                _SEARCH, (match, marketplace, region or '', time.time() - max_age, limit)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error searching product index: {str(e)}")
+            return []
+        return [json.loads(data) for (data,) in rows]
+
+    def flush(self):
+        """Blocks until every queued product has been written"""
+        self._queue.join()
+
+    def _write_loop(self):
+        connection = self._connect()
+        last_prune = 0.0
+        while True:
+            batches = [self._queue.get()]
+            pending = len(batches[0])
+            deadline = time.monotonic() + self.flush_interval
+            # Collect more queued writes so they share one transaction
+            while pending < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batches.append(batch)
+                pending += len(batch)
+
+            try:
+                with connection:
+                    for batch in batches:
+                        connection.executemany(_UPSERT, batch)
+                    if time.monotonic() - last_prune > self.retention / 10:
+                        connection.execute(
+                            "DELETE FROM products WHERE fetched_at < ?", (time.time() - self.retention,)
+                        )
+                        last_prune = time.monotonic()
+                logger.debug(f"Indexed {pending} products")
+            except sqlite3.Error as e:
+                logger.error(f"Error writing to product index: {str(e)}")
+            finally:
+                for _ in batches:
+                    self._queue.task_done()
@@ -0,0 +1,193 @@
+import asyncio
+import heapq
+import logging
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from itertools import count
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first: a user waiting on one marketplace beats Search All,
+# which beats background work such as prefetches and refreshes
+PRIORITY_SINGLE = 0
+PRIORITY_MULTI = 1
+PRIORITY_BACKGROUND = 2
+
+# Apify error types that mean "slow down" rather than "broken request"
+RATE_LIMIT_ERROR_TYPES = {
+    'rate-limit-exceeded',
+    'actor-memory-limit-exceeded',
+    'max-concurrent-actor-runs-exceeded',
+}
+
+
+class ApifyQuotaError(Exception):
+    """Raised when Apify keeps rejecting calls for rate or run limits after all retries"""
+
+
+def is_rate_limited(error):
+    if getattr(error, 'status_code', None) == 429:
+        return True
+    if getattr(error, 'type', None) in RATE_LIMIT_ERROR_TYPES:
+        return True
+    return 'too many' in str(error).lower()
+
+
+class ApifyGovernor:
+    """
+    Process-wide limits shared by every marketplace client:
+    - a priority semaphore sized to the plan's concurrent actor run limit,
+    - a token bucket for Apify API calls,
+    - jittered exponential backoff when Apify answers 429 / limit errors.
+    Works for both blocking callers (worker threads) and coroutines.
+    """
+
+    def __init__(self, max_runs=None, rate=None, burst=None, max_retries=None,
+                 backoff_base=None, backoff_max=None):
+        self.max_runs = settings.APIFY_MAX_CONCURRENT_RUNS if max_runs is None else max_runs
+        self.rate = settings.APIFY_API_RATE if rate is None else rate
+        self.burst = settings.APIFY_API_BURST if burst is None else burst
+        self.max_retries = settings.APIFY_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = settings.APIFY_BACKOFF_BASE if backoff_base is None else backoff_base
+        self.backoff_max = settings.APIFY_BACKOFF_MAX if backoff_max is None else backoff_max
+
+        self._lock = threading.Lock()
+        self._running = 0
+        self._waiters = []
+        self._sequence = count()
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self.rate_limited = 0
+
+    # Run slots
+
+    def _acquire_or_enqueue(self, priority, wake):
+        with self._lock:
+            if self._running < self.max_runs and not self._waiters:
+                self._running += 1
+                return True
+            heapq.heappush(self._waiters, (priority, next(self._sequence), wake))
+            return False
+
+    def release_run(self):
+        """Frees a run slot, handing it straight to the highest-priority waiter"""
+        with self._lock:
+            if self._waiters:
+                _, _, wake = heapq.heappop(self._waiters)
+            else:
+                self._running -= 1
+                return
+        wake()
+
+    def acquire_run(self, priority=PRIORITY_SINGLE):
+        event = threading.Event()
+        if not self._acquire_or_enqueue(priority, event.set):
+            event.wait()
+
+    async def acquire_run_async(self, priority=PRIORITY_SINGLE):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def grant():
+            # A waiter cancelled while queued passes the slot on
+            if future.cancelled():
+                self.release_run()
+            else:
+                future.set_result(None)
+
+        if not self._acquire_or_enqueue(priority, lambda: loop.call_soon_threadsafe(grant)):
+            await future
+
+    @contextmanager
+    def run_slot(self, priority=PRIORITY_SINGLE):
+        self.acquire_run(priority)
+        try:
+            yield
+        finally:
+            self.release_run()
+
+    @asynccontextmanager
+    async def run_slot_async(self, priority=PRIORITY_SINGLE):
+        await self.acquire_run_async(priority)
+        try:
+            yield
+        finally:
+            self.release_run()
+
+    # API call rate
+
+    def _reserve_token(self):
+        """Takes a token (possibly in advance) and returns how long to wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+            self._refilled_at = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def throttle(self):
+        """Blocks until the next API call is allowed"""
+        time.sleep(self._reserve_token())
+
+    async def throttle_async(self):
+        await asyncio.sleep(self._reserve_token())
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def call(self, func, *args, **kwargs):
+        """Runs a blocking Apify API call under the rate limit, retrying limit errors"""
+        for attempt in range(self.max_retries + 1):
+            self.throttle()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limited(e):
+                    raise
+                self._on_rate_limited(e, attempt)
+                time.sleep(self._backoff(attempt))
+        raise ApifyQuotaError("Apify rate limit still exceeded after retries")
+
+    async def call_async(self, func, *args, **kwargs):
+        """Async counterpart of call() for coroutine functions"""
+        for attempt in range(self.max_retries + 1):
+            await self.throttle_async()
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limited(e):
+                    raise
+                self._on_rate_limited(e, attempt)
+                await asyncio.sleep(self._backoff(attempt))
+        raise ApifyQuotaError("Apify rate limit still exceeded after retries")
+
+    def _on_rate_limited(self, error, attempt):
+        with self._lock:
+            self.rate_limited += 1
+        logger.warning(f"Apify limit hit (attempt {attempt + 1}/{self.max_retries + 1}): {str(error)}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': self._running,
+                'waiting': len(self._waiters),
+                'tokens': round(self._tokens, 2),
+                'rate_limited': self.rate_limited,
+            }
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor():
+    """Returns the process-wide governor shared by all clients"""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = ApifyGovernor()
+        return _governor
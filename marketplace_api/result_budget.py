@@ -0,0 +1,109 @@
+import math
+import random
+import threading
+from collections import defaultdict, deque
+
+from config import settings
+from utils.query_normalizer import numeric_tokens
+
+# Budget is the observed 90th percentile depth of the chosen product, plus headroom
+DEPTH_PERCENTILE = 0.9
+DEPTH_HEADROOM = 1.5
+
+
+def query_class(canonical_query):
+    """
+    Buckets a canonical query so budgets are learned per kind of search:
+    'model' queries name a model number or size, 'specific' ones have several
+    terms and 'broad' ones are one or two words.
+    """
+    if numeric_tokens(canonical_query):
+        return 'model'
+    if len(canonical_query.split()) >= 3:
+        return 'specific'
+    return 'broad'
+
+
+class ResultBudget:
+    """
+    Learns how many items each marketplace actor should return per query class.
+    It tracks how deep in the result list the chosen best product sat and how
+    actor latency grows with the item count, and trims maxItems accordingly.
+    A fraction of searches still use the full budget so depth observations are
+    not biased by the trimmed lists.
+    """
+
+    def __init__(self, min_items=None, max_items=None, explore_rate=None,
+                 min_samples=None, latency_target=None, window=200):
+        self.min_items = settings.RESULT_BUDGET_MIN_ITEMS if min_items is None else min_items
+        self.max_items = settings.RESULT_BUDGET_MAX_ITEMS if max_items is None else max_items
+        self.explore_rate = settings.RESULT_BUDGET_EXPLORE_RATE if explore_rate is None else explore_rate
+        self.min_samples = settings.RESULT_BUDGET_MIN_SAMPLES if min_samples is None else min_samples
+        self.latency_target = (
+            settings.RESULT_BUDGET_LATENCY_TARGET if latency_target is None else latency_target
+        )
+        self._depths = defaultdict(lambda: deque(maxlen=window))
+        # Running sums for a least-squares fit of latency = intercept + slope * items
+        self._latency_sums = defaultdict(lambda: [0, 0.0, 0.0, 0.0, 0.0])
+        self._random = random.Random()
+        self._lock = threading.Lock()
+
+    def items_for(self, marketplace, canonical_query):
+        """Returns the maxItems to request for this marketplace and query"""
+        key = (marketplace, query_class(canonical_query))
+        with self._lock:
+            depths = sorted(self._depths.get(key, ()))
+            if len(depths) < self.min_samples or self._random.random() < self.explore_rate:
+                return self.max_items
+
+            depth = depths[math.ceil(DEPTH_PERCENTILE * (len(depths) - 1))] + 1
+            budget = math.ceil(depth * DEPTH_HEADROOM)
+
+            model = self._latency_model(marketplace)
+            if model and self.latency_target:
+                intercept, slope = model
+                if slope > 0:
+                    affordable = int((self.latency_target - intercept) / slope)
+                    budget = min(budget, max(affordable, depth))
+
+            return max(self.min_items, min(self.max_items, budget))
+
+    def record(self, marketplace, canonical_query, best_rank, item_count, latency):
+        """
+        Records one finished search.
+
+        Args:
+            best_rank (int): 0-based position of the chosen product, or None if nothing was chosen
+            item_count (int): maxItems the actor was asked for
+            latency (float): Actor run time in seconds, or None if unknown
+        """
+        with self._lock:
+            # Depth is only learned from full-size runs: in a trimmed list the best rank is
+            # always below the trimmed length, which would ratchet the budget down
+            if best_rank is not None and item_count == self.max_items:
+                self._depths[(marketplace, query_class(canonical_query))].append(best_rank)
+            if latency is None:
+                return
+            sums = self._latency_sums[marketplace]
+            sums[0] += 1
+            sums[1] += item_count
+            sums[2] += latency
+            sums[3] += item_count * item_count
+            sums[4] += item_count * latency
+
+    def _latency_model(self, marketplace):
+        n, sx, sy, sxx, sxy = self._latency_sums.get(marketplace, (0, 0.0, 0.0, 0.0, 0.0))
+        denominator = n * sxx - sx * sx
+        if n < self.min_samples or denominator <= 0:
+            return None
+        slope = (n * sxy - sx * sy) / denominator
+        intercept = (sy - slope * sx) / n
+        return intercept, slope
+
+    def stats(self):
+        """Returns observed depths and latency models per marketplace"""
+        with self._lock:
+            return {
+                'depth_samples': {f"{m}:{c}": len(d) for (m, c), d in self._depths.items()},
+                'latency_models': {m: self._latency_model(m) for m in self._latency_sums},
+            }
@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from config import settings
+from utils.query_normalizer import normalize_query, numeric_tokens
+from utils.similarity import LSHIndex, MinHasher, char_shingles, jaccard
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on near-match candidates verified per lookup
+MAX_SIMILAR_CANDIDATES = 32
+
+
+class ResultCache:
+    """
+    In-memory cache of search results keyed on (namespace, canonical query).
+    Close variants of a cached query (same number of words, same numbers) are
+    served through a MinHash/LSH index when their trigram similarity passes the
+    threshold. Expired entries are purged on every put, and the cache is capped
+    by the total number of cached products, evicting least recently used entries.
+    """
+
+    def __init__(self, ttl=None, max_products=None, similarity_threshold=None):
+        self.ttl = settings.QUERY_CACHE_TTL if ttl is None else ttl
+        self.max_products = settings.QUERY_CACHE_MAX_PRODUCTS if max_products is None else max_products
+        self.similarity_threshold = (
+            settings.QUERY_SIMILARITY_THRESHOLD if similarity_threshold is None else similarity_threshold
+        )
+        # LRU order, for the size cap
+        self._entries = OrderedDict()
+        # Store order, oldest first, for purging expired entries
+        self._stored = OrderedDict()
+        self._product_count = 0
+        self._hasher = MinHasher()
+        self._index = LSHIndex(num_perm=self._hasher.num_perm)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _is_fresh(self, entry, now):
+        return now - entry['stored_at'] < self.ttl
+
+    @staticmethod
+    def _partition(namespace, canonical):
+        # Partitioning on numeric tokens means queries that differ in a model number
+        # or size ("iphone 14" vs "iphone 15") are never merged, and on the word count
+        # that added words ("kids kindle paperwhite") are not either
+        return namespace, numeric_tokens(canonical), len(canonical.split())
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._product_count -= len(entry['results'])
+        self._stored.pop(key, None)
+        self._index.remove(key)
+
+    def _purge_expired(self, now):
+        while self._stored:
+            key, stored_at = next(iter(self._stored.items()))
+            if now - stored_at < self.ttl:
+                break
+            self._drop(key)
+
+    def get(self, namespace, query, stats=None):
+        """
+        Returns cached results for the query (or a near variant of it), or None.
+        When a `stats` dict is given, the maxItems the results were fetched with is
+        stored in it as 'item_count' (None if unknown).
+        """
+        canonical = normalize_query(query)
+        if not canonical:
+            return None
+        key = (namespace, canonical)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._is_fresh(entry, now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    if stats is not None:
+                        stats['item_count'] = entry['item_count']
+                    return list(entry['results'])
+                self._drop(key)
+
+            match = self._find_similar(namespace, canonical, now)
+            if match is not None:
+                self._entries.move_to_end(match)
+                self.near_hits += 1
+                logger.debug(f"Serving '{canonical}' from cached near variant '{match[1]}'")
+                if stats is not None:
+                    stats['item_count'] = self._entries[match]['item_count']
+                return list(self._entries[match]['results'])
+
+            self.misses += 1
+            return None
+
+    def _find_similar(self, namespace, canonical, now):
+        shingles = char_shingles(canonical)
+        best_key, best_score = None, self.similarity_threshold
+
+        candidates = self._index.candidates(
+            self._hasher.signature(shingles),
+            partition=self._partition(namespace, canonical),
+            limit=MAX_SIMILAR_CANDIDATES
+        )
+        for key in candidates:
+            entry = self._entries.get(key)
+            if entry is None or not self._is_fresh(entry, now):
+                continue
+            score = jaccard(shingles, char_shingles(key[1]))
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def put(self, namespace, query, results, item_count=None):
+        """Stores results for the canonical form of the query, fetched with maxItems `item_count`"""
+        canonical = normalize_query(query)
+        if not canonical:
+            return
+        key = (namespace, canonical)
+
+        results = list(results)
+        now = time.monotonic()
+
+        with self._lock:
+            self._purge_expired(now)
+            self._drop(key)
+            self._entries[key] = {'results': results, 'stored_at': now, 'item_count': item_count}
+            self._stored[key] = now
+            self._product_count += len(results)
+            self._index.insert(
+                key,
+                self._hasher.signature(char_shingles(canonical)),
+                partition=self._partition(namespace, canonical)
+            )
+
+            while self._product_count > self.max_products and len(self._entries) > 1:
+                self._drop(next(iter(self._entries)))
+
+    def stats(self):
+        """Returns hit/miss counters and current size"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'products': self._product_count,
+                'hits': self.hits,
+                'near_hits': self.near_hits,
+                'misses': self.misses,
+            }
@@ -0,0 +1,170 @@
+import asyncio
+import hmac
+import json
+import logging
+import secrets
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Webhook events that end an actor run
+TERMINAL_EVENTS = [
+    'ACTOR.RUN.SUCCEEDED',
+    'ACTOR.RUN.FAILED',
+    'ACTOR.RUN.ABORTED',
+    'ACTOR.RUN.TIMED_OUT',
+]
+TERMINAL_STATUSES = {'SUCCEEDED', 'FAILED', 'ABORTED', 'TIMED-OUT'}
+
+MAX_BODY_BYTES = 1024 * 1024
+HEADER_TIMEOUT = 10
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found', 413: 'Payload Too Large'}
+
+
+class RunWaitTimeoutError(Exception):
+    """Raised when an actor run has not finished within the wait timeout"""
+
+
+class ApifyRunWaiter:
+    """
+    Resumes searches when their Apify actor run finishes, without holding a thread.
+    Runs are started with an ad-hoc webhook pointing at a small HTTP endpoint served
+    from the bot's event loop; each waiting search awaits an asyncio future that the
+    webhook resolves, so an in-flight run costs only memory.
+    """
+
+    def __init__(self, host=None, port=None, public_url=None, secret=None, early_ttl=300):
+        self.host = settings.APIFY_WEBHOOK_HOST if host is None else host
+        self.port = settings.APIFY_WEBHOOK_PORT if port is None else port
+        self.public_url = settings.APIFY_WEBHOOK_PUBLIC_URL if public_url is None else public_url
+        self.secret = (settings.APIFY_WEBHOOK_SECRET if secret is None else secret) or secrets.token_urlsafe(24)
+        self.path = urlsplit(self.public_url).path or '/'
+        self.early_ttl = early_ttl
+        self._waiting = {}
+        # Runs whose webhook arrived before anyone waited on them
+        self._early = {}
+        self._server = None
+
+    @property
+    def in_flight(self):
+        return len(self._waiting)
+
+    @property
+    def port_bound(self):
+        """Actual listening port (useful when started with port 0)"""
+        return self._server.sockets[0].getsockname()[1] if self._server else None
+
+    def webhooks(self):
+        """Ad-hoc webhook definitions to pass when starting an actor run"""
+        separator = '&' if '?' in self.public_url else '?'
+        return [{
+            'event_types': TERMINAL_EVENTS,
+            'request_url': f"{self.public_url}{separator}token={self.secret}",
+        }]
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(f"Listening for Apify run webhooks on {self.host}:{self.port_bound}{self.path}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for future in self._waiting.values():
+            if not future.done():
+                future.cancel()
+        self._waiting.clear()
+
+    async def wait(self, run_id, timeout=None, poll=None):
+        """
+        Waits for a run's completion webhook and returns the finished run.
+        If no webhook arrives within the timeout, `poll` (an async callable returning
+        the run) is asked once before giving up.
+        """
+        timeout = settings.APIFY_RUN_TIMEOUT if timeout is None else timeout
+        early = self._early.pop(run_id, None)
+        if early is not None:
+            return early[0]
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[run_id] = future
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            if poll is not None:
+                run = await poll()
+                if run and run.get('status') in TERMINAL_STATUSES:
+                    logger.warning(f"Missed webhook for run {run_id}, recovered by polling")
+                    return run
+            raise RunWaitTimeoutError(f"Actor run {run_id} did not finish within {timeout}s")
+        finally:
+            self._waiting.pop(run_id, None)
+
+    def _resolve(self, payload):
+        run = payload.get('resource') or {}
+        run_id = (payload.get('eventData') or {}).get('actorRunId') or run.get('id')
+        if not run_id:
+            return False
+        if not run.get('status'):
+            run = {**run, 'id': run_id, 'status': payload.get('eventType', '').rsplit('.', 1)[-1]}
+
+        future = self._waiting.get(run_id)
+        if future is not None and not future.done():
+            future.set_result(run)
+        else:
+            now = time.monotonic()
+            self._early[run_id] = (run, now)
+            for stale_id in [k for k, (_, at) in self._early.items() if now - at > self.early_ttl]:
+                del self._early[stale_id]
+        logger.debug(f"Webhook {payload.get('eventType')} for run {run_id}")
+        return True
+
+    def _handle_request(self, method, target, body):
+        url = urlsplit(target)
+        if method != 'POST' or url.path != self.path:
+            return 404
+        token = parse_qs(url.query).get('token', [''])[0]
+        if not hmac.compare_digest(token, self.secret):
+            return 403
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return 400
+        return 200 if isinstance(payload, dict) and self._resolve(payload) else 400
+
+    async def _handle_connection(self, reader, writer):
+        status = 400
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            length = int(headers.get('content-length', 0))
+            if length > MAX_BODY_BYTES:
+                status = 413
+            else:
+                body = await asyncio.wait_for(reader.readexactly(length), HEADER_TIMEOUT)
+                status = self._handle_request(method, target, body)
+        except (ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError) as e:
+            logger.debug(f"Bad webhook request: {str(e)}")
+        try:
+            writer.write(
+                f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+                .encode('latin-1')
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,164 @@
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerBusyError(Exception):
+    """Raised when the search queue is too deep to accept another search"""
+
+    def __init__(self, queue_depth):
+        super().__init__(f"Search queue is full ({queue_depth} waiting)")
+        self.queue_depth = queue_depth
+
+
+class UserQuotaExceededError(Exception):
+    """Raised when a user already has the maximum number of searches queued or running"""
+
+    def __init__(self, user_id, limit):
+        super().__init__(f"User {user_id} already has {limit} searches in progress")
+        self.user_id = user_id
+        self.limit = limit
+
+
+class SearchTicket:
+    """
+    Handle for a submitted search. Await it to get the search result.
+    `position` is the number of searches ahead of it when it was submitted (0 = started).
+    """
+
+    def __init__(self, user_id, func, args, kwargs, future):
+        self.user_id = user_id
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.submitted_at = time.monotonic()
+        self.position = 0
+        # Runs in the submitter's context (e.g. its profiling decision), not the dispatcher's
+        self.context = contextvars.copy_context()
+
+    def __await__(self):
+        return self.future.__await__()
+
+
+class SearchScheduler:
+    """
+    Runs marketplace searches (coroutine functions on the loop, blocking ones in
+    worker threads), with a global
+    concurrency cap, per-user quotas and round-robin fairness across users:
+    a user with many queued searches only gets one turn per round.
+    `user_id` can be any hashable key, e.g. ('inline', user_id) for background work
+    that should not count against the user's own quota.
+    """
+
+    def __init__(self, max_concurrent=None, max_per_user=None, max_queue_depth=None, stats_window=500):
+        self.max_concurrent = settings.SEARCH_MAX_CONCURRENT if max_concurrent is None else max_concurrent
+        self.max_per_user = settings.SEARCH_MAX_PER_USER if max_per_user is None else max_per_user
+        self.max_queue_depth = settings.SEARCH_MAX_QUEUE_DEPTH if max_queue_depth is None else max_queue_depth
+        self._queues = {}
+        self._ring = deque()
+        self._running = 0
+        self._running_per_user = {}
+        self._waits = deque(maxlen=stats_window)
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def queue_depth(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _user_load(self, user_id):
+        return len(self._queues.get(user_id, ())) + self._running_per_user.get(user_id, 0)
+
+    def _position(self, user_id, index):
+        """Searches that run before the user's index-th queued search under round-robin"""
+        ahead = index
+        user_turn = self._ring.index(user_id)
+        for turn, other in enumerate(self._ring):
+            if other != user_id:
+                ahead += min(len(self._queues[other]), index + (1 if turn < user_turn else 0))
+        return ahead
+
+    def submit(self, user_id, func, *args, **kwargs):
+        """
+        Queues a search for a user. Must be called from the event loop.
+
+        Raises:
+            UserQuotaExceededError: The user has too many searches in progress
+            SchedulerBusyError: The queue is full
+        """
+        if self._user_load(user_id) >= self.max_per_user:
+            self.rejected += 1
+            raise UserQuotaExceededError(user_id, self.max_per_user)
+        if self._running >= self.max_concurrent and self.queue_depth >= self.max_queue_depth:
+            self.rejected += 1
+            raise SchedulerBusyError(self.queue_depth)
+
+        ticket = SearchTicket(user_id, func, args, kwargs, asyncio.get_running_loop().create_future())
+        queue = self._queues.setdefault(user_id, deque())
+        queue.append(ticket)
+        if user_id not in self._ring:
+            self._ring.append(user_id)
+
+        self._dispatch()
+        if not ticket.future.done() and ticket in queue:
+            ticket.position = self._position(user_id, queue.index(ticket)) + 1
+        return ticket
+
+    def _dispatch(self):
+        while self._running < self.max_concurrent and self._ring:
+            user_id = self._ring.popleft()
+            queue = self._queues[user_id]
+            ticket = queue.popleft()
+            if queue:
+                self._ring.append(user_id)
+            else:
+                del self._queues[user_id]
+
+            if ticket.future.done():
+                # Cancelled while waiting
+                continue
+
+            self._running += 1
+            self._running_per_user[user_id] = self._running_per_user.get(user_id, 0) + 1
+            self._waits.append(time.monotonic() - ticket.submitted_at)
+            asyncio.get_running_loop().create_task(self._run(ticket), context=ticket.context)
+
+    async def _run(self, ticket):
+        try:
+            if asyncio.iscoroutinefunction(ticket.func):
+                result = await ticket.func(*ticket.args, **ticket.kwargs)
+            else:
+                result = await asyncio.to_thread(ticket.func, *ticket.args, **ticket.kwargs)
+            if not ticket.future.done():
+                ticket.future.set_result(result)
+        except Exception as e:
+            if not ticket.future.done():
+                ticket.future.set_exception(e)
+        finally:
+            self._running -= 1
+            self._running_per_user[ticket.user_id] -= 1
+            if not self._running_per_user[ticket.user_id]:
+                del self._running_per_user[ticket.user_id]
+            self.completed += 1
+            self._dispatch()
+
+    def stats(self):
+        """Returns queue depth, running searches and recent wait times (seconds)"""
+        waits = sorted(self._waits)
+        return {
+            'queue_depth': self.queue_depth,
+            'queued_users': len(self._ring),
+            'running': self._running,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'wait_avg': sum(waits) / len(waits) if waits else 0.0,
+            'wait_p95': waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+            'wait_max': waits[-1] if waits else 0.0,
+        }
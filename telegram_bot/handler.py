@@ -1,11 +1,23 @@
+import asyncio
 import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import (
+    Update, InlineKeyboardButton, InlineKeyboardMarkup,
+    InlineQueryResultArticle, InlineQueryResultsButton, InputTextMessageContent
+)
 from telegram.ext import (
     ContextTypes, ConversationHandler, CommandHandler, 
-    CallbackQueryHandler, MessageHandler, filters, Application
+    CallbackQueryHandler, MessageHandler, InlineQueryHandler, filters, Application
+)
+from config import settings
+from marketplace_api import (
+    MarketplaceManager, SearchScheduler, SchedulerBusyError, UserQuotaExceededError,
+    ApifyQuotaError, PRIORITY_BACKGROUND
 )
-from marketplace_api import MarketplaceManager
-from .message_formatter import format_product_message
+from .message_formatter import format_product_message, format_deal_group_message
+from .result_store import ResultStore
+from .watchlist import PriceWatcher
+from utils.ranking import rating_score, top_k
+from utils.sampling_profiler import get_profiler
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -15,9 +27,30 @@ MAIN_MENU = 0
 CHOOSING_MARKETPLACE = 1
 ENTERING_SEARCH = 2
 
+# Number of distinct deals shown for "Search All"
+MAX_DISTINCT_DEALS = 5
+
+# Inline mode answers at most this many products
+MAX_INLINE_RESULTS = 10
+
 class BestDealHandler:
     def __init__(self):
         self.marketplace_manager = MarketplaceManager()
+        self.search_scheduler = SearchScheduler()
+        self.result_store = ResultStore()
+        self.profiler = get_profiler()
+        self.price_watcher = PriceWatcher(self.marketplace_manager)
+        # Pending background fetch per inline user, replaced as they keep typing
+        self._inline_fetches = {}
+
+    async def post_init(self, application: Application):
+        """Starts background services once the application is initialized"""
+        await self.marketplace_manager.start()
+        await self.price_watcher.start(application.job_queue)
+        application.create_task(self.profiler.monitor_event_loop())
+
+    async def post_shutdown(self, application: Application):
+        await self.marketplace_manager.stop()
 
     def get_start_keyboard(self):
         """Returns the initial start keyboard"""
@@ -181,22 +214,69 @@ class BestDealHandler:
         marketplace = query.data.replace("market_", "")
         context.user_data['marketplace'] = marketplace
         context.user_data['search_type'] = 'single'
+        context.user_data.pop('region', None)
+        
+        regions = self.marketplace_manager.get_marketplace_regions(marketplace)
+        if regions:
+            keyboard = [
+                [InlineKeyboardButton(region, callback_data=f"region_{region}") for region in regions],
+                [InlineKeyboardButton("🌍 All regions", callback_data="region_all")],
+                [InlineKeyboardButton("⬅️ Back", callback_data="back_to_search_options")]
+            ]
+            await query.edit_message_text(
+                f"Choose a region for {self.marketplace_manager.get_marketplace_display_name(marketplace)}:",
+                reply_markup=InlineKeyboardMarkup(keyboard)
+            )
+            return CHOOSING_MARKETPLACE
         
         await query.edit_message_text(
             f"Enter your search term to find products on {self.marketplace_manager.get_marketplace_display_name(marketplace)}:"
         )
         return ENTERING_SEARCH
 
+    async def handle_region_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle region selection for marketplaces with regions"""
+        query = update.callback_query
+        await query.answer()
+        
+        region = query.data.replace("region_", "")
+        context.user_data['region'] = region
+        marketplace_name = self.marketplace_manager.get_marketplace_display_name(context.user_data.get('marketplace'))
+        where = "all regions" if region == 'all' else region
+        
+        await query.edit_message_text(
+            f"Enter your search term to find products on {marketplace_name} ({where}):"
+        )
+        return ENTERING_SEARCH
+
     async def handle_search(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Process the search term and return results"""
+        # One profiling decision covers every profiled stage of this search
+        with self.profiler.search():
+            return await self._handle_search(update, context)
+
+    async def _handle_search(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         search_term = update.message.text
         search_type = context.user_data.get('search_type')
+        marketplace = context.user_data.get('marketplace')
+        if search_type is None or (search_type == 'single' and marketplace is None):
+            # The session sweep may have dropped this user's data while the conversation
+            # still waited for a search term
+            await update.message.reply_text(
+                "⌛ Your search session expired. Please choose where to search again.",
+                reply_markup=self.get_main_menu_keyboard()
+            )
+            return MAIN_MENU
         
         status_message = await update.message.reply_text("🔍 Searching for products...")
+        user_id = update.effective_user.id
         
         try:
             if search_type == 'all':
-                results = self.marketplace_manager.search_all_marketplaces(search_term)
+                results = await self._run_scheduled(
+                    user_id, status_message,
+                    self.marketplace_manager.search_all_marketplaces_async, search_term
+                )
                 # Combine all results and find best deals
                 all_products = []
                 for marketplace_results in results.values():
@@ -211,28 +291,58 @@ class BestDealHandler:
                 # Format and send results
                 # await status_message.edit_text("✅ Found great deals! Here are the best products:")
                 
-                for marketplace, products in results.items():
-                    if products:
-                        best_product = max(products, key=lambda x: float(x.get('rating', 0) or 0))
-                        message, url = format_product_message(best_product)
+                # Only the CPU-bound stages are profiled, not the actor runs
+                with self.profiler.session("search_all_results"):
+                    # Same product from several marketplaces is shown once, at its cheapest
+                    # listing when the prices share a currency
+                    groups = await self.marketplace_manager.group_duplicate_results_async(results)
+                    best_groups = top_k(
+                        groups, MAX_DISTINCT_DEALS,
+                        scorer=lambda g: max(rating_score(p) for p in g['products'])
+                    )
+                    # Every listing, not just the best of each group, can be paged through
+                    # from the last deal message
+                    session = self.result_store.save(update.effective_chat.id, all_products)
+                    replies = []
+                    for index, group in enumerate(best_groups):
+                        message, url = format_deal_group_message(group)
                         
-                        reply_markup = None
+                        keyboard = []
                         if url:
-                            keyboard = [[InlineKeyboardButton("🛒 View Product", url=url)]]
-                            reply_markup = InlineKeyboardMarkup(keyboard)
-                        
-                        marketplace_name = self.marketplace_manager.get_marketplace_display_name(marketplace)
-                        full_message = f"🏪 **{marketplace_name}**\n{message}"
+                            keyboard.append([InlineKeyboardButton("🛒 View Product", url=url)])
+                        if index == len(best_groups) - 1 and len(session.records) > 1:
+                            keyboard.append([InlineKeyboardButton(
+                                f"📋 Browse all {len(session.records)} results",
+                                callback_data=f"page_show:{session.id}"
+                            )])
+                        reply_markup = InlineKeyboardMarkup(keyboard) if keyboard else None
                         
-                        await update.message.reply_text(
-                            text=full_message,
-                            reply_markup=reply_markup,
-                            parse_mode="Markdown"
-                        )
+                        marketplace_name = group['best'].get('marketplace', '')
+                        replies.append((f"🏪 **{marketplace_name}**\n{message}", reply_markup))
+                
+                for full_message, reply_markup in replies:
+                    await update.message.reply_text(
+                        text=full_message,
+                        reply_markup=reply_markup,
+                        parse_mode="Markdown"
+                    )
                 
             else:
-                marketplace = context.user_data.get('marketplace')
-                products = self.marketplace_manager.search_marketplace(marketplace, search_term)
+                region = context.user_data.get('region')
+                fetch_stats = {}
+                if region == 'all':
+                    results = await self._run_scheduled(
+                        user_id, status_message,
+                        self.marketplace_manager.search_regions_async, marketplace, search_term,
+                        fetch_stats=fetch_stats
+                    )
+                    products = [product for region_results in results.values() for product in region_results]
+                else:
+                    products = await self._run_scheduled(
+                        user_id, status_message,
+                        self.marketplace_manager.search_marketplace_async, marketplace, search_term, region,
+                        fetch_stats=fetch_stats
+                    )
                 
                 if not products:
                     marketplace_name = self.marketplace_manager.get_marketplace_display_name(marketplace)
@@ -243,16 +353,30 @@ class BestDealHandler:
                     await self.return_to_main_menu(update, context)
                     return MAIN_MENU
                 
-                # Get best product based on rating
-                best_product = max(products, key=lambda x: float(x.get('rating', 0) or 0))
-                message, url = format_product_message(best_product)
-                
-                reply_markup = None
-                if url:
-                    keyboard = [[InlineKeyboardButton("🛒 View Product", url=url)]]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-
+                # Keep every fetched product so the user can page through them;
+                # the session starts on the best rated product. Lists trimmed by the
+                # result budget can be refetched at full size with "Show more"
+                with self.profiler.session("search_results"):
+                    session = self.result_store.save(
+                        update.effective_chat.id, products,
+                        search=(marketplace, search_term, region),
+                        complete=(fetch_stats.get('item_count') or 0) >= settings.RESULT_BUDGET_MAX_ITEMS
+                    )
+                    message, reply_markup = self.render_result_page(session)
+                await update.message.reply_text(
+                    text=message,
+                    reply_markup=reply_markup,
+                    parse_mode="Markdown"
+                )
                 
+        except UserQuotaExceededError:
+            await status_message.edit_text(
+                "⏳ You already have a search in progress. Please wait for it to finish."
+            )
+        except (SchedulerBusyError, ApifyQuotaError):
+            await status_message.edit_text(
+                "🚦 We're very busy right now. Please try again in a minute."
+            )
         except Exception as e:
             logger.error(f"Error during search: {str(e)}")
             await status_message.edit_text(
@@ -263,6 +387,256 @@ class BestDealHandler:
         await self.return_to_main_menu(update, context)
         return MAIN_MENU
 
+    async def _run_scheduled(self, user_id, status_message, func, *args, **kwargs):
+        """Runs a search through the scheduler, telling the user when they have to wait"""
+        ticket = self.search_scheduler.submit(user_id, func, *args, **kwargs)
+        if ticket.position and status_message is not None:
+            await status_message.edit_text(
+                f"⏳ Busy right now, you're #{ticket.position} in line. Your search will start shortly..."
+            )
+        result = await ticket
+        logger.debug(f"Search scheduler stats: {self.search_scheduler.stats()}")
+        return result
+
+    def render_result_page(self, session):
+        """Returns the message and Next/Previous/Sort keyboard for the session's current product"""
+        record = session.current
+        message, url = format_product_message(record.to_product())
+        marketplace = f"{record.marketplace} ({record.region})" if record.region else record.marketplace
+        header = f"🏪 **{marketplace}** · {session.position + 1}/{len(session.records)}"
+
+        navigation = []
+        if session.position > 0:
+            navigation.append(InlineKeyboardButton("⬅️ Previous", callback_data=f"page_prev:{session.id}"))
+        if session.position < len(session.records) - 1:
+            navigation.append(InlineKeyboardButton("Next ➡️", callback_data=f"page_next:{session.id}"))
+
+        keyboard = []
+        if url:
+            keyboard.append([InlineKeyboardButton("🛒 View Product", url=url)])
+        if navigation:
+            keyboard.append(navigation)
+        if session.position == len(session.records) - 1 and session.search and not session.complete:
+            keyboard.append([InlineKeyboardButton("🔎 Show more results", callback_data=f"page_more:{session.id}")])
+        if len(session.records) > 1:
+            if session.sort == 'price':
+                keyboard.append([InlineKeyboardButton("⭐ Sort by rating", callback_data=f"page_sort_rating:{session.id}")])
+            elif session.price_sortable:
+                # Results in several currencies (e.g. Search All, all regions) are not sorted by price
+                keyboard.append([InlineKeyboardButton("💲 Sort by price", callback_data=f"page_sort_price:{session.id}")])
+
+        return f"{header}\n{message}", InlineKeyboardMarkup(keyboard) if keyboard else None
+
+    async def handle_result_page(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle Next/Previous/Sort buttons on a result message, from already fetched results"""
+        query = update.callback_query
+        action, _, session_id = query.data.partition(':')
+        session = self.result_store.get(session_id, update.effective_chat.id)
+        if session is None or not session.records:
+            await query.answer("These results have expired. Please search again.", show_alert=True)
+            return
+
+        if action == "page_more":
+            await query.answer("🔎 Fetching more results...")
+            with self.profiler.search():
+                loaded = await self._load_more_results(update, session)
+            if not loaded:
+                return
+        else:
+            await query.answer()
+        if action == "page_next":
+            session.move(1)
+        elif action == "page_prev":
+            session.move(-1)
+        elif action == "page_sort_price" and session.price_sortable:
+            session.sort_by('price')
+        elif action == "page_sort_rating":
+            session.sort_by('rating')
+
+        message, reply_markup = self.render_result_page(session)
+        if action == "page_show":
+            # Opened from a Search All deal message, which stays as it is
+            await query.message.reply_text(
+                text=message,
+                reply_markup=reply_markup,
+                parse_mode="Markdown"
+            )
+            return
+        await query.edit_message_text(
+            text=message,
+            reply_markup=reply_markup,
+            parse_mode="Markdown"
+        )
+
+    async def _load_more_results(self, update: Update, session):
+        """Refetches the session's search at the full item budget; returns False if it failed"""
+        marketplace, search_term, region = session.search
+        max_items = settings.RESULT_BUDGET_MAX_ITEMS
+        try:
+            if region == 'all':
+                results = await self._run_scheduled(
+                    update.effective_user.id, None,
+                    self.marketplace_manager.search_regions_async, marketplace, search_term,
+                    max_items=max_items
+                )
+                products = [product for region_results in results.values() for product in region_results]
+            else:
+                products = await self._run_scheduled(
+                    update.effective_user.id, None,
+                    self.marketplace_manager.search_marketplace_async, marketplace, search_term, region,
+                    max_items=max_items
+                )
+        except UserQuotaExceededError:
+            await update.effective_message.reply_text(
+                "⏳ You already have a search in progress. Please wait for it to finish."
+            )
+            return False
+        except (SchedulerBusyError, ApifyQuotaError):
+            await update.effective_message.reply_text("🚦 We're very busy right now. Please try again in a minute.")
+            return False
+        except Exception as e:
+            logger.error(f"Error loading more results: {str(e)}")
+            await update.effective_message.reply_text("😔 Sorry, I couldn't load more results. Please try again.")
+            return False
+
+        if products:
+            self.result_store.reload(session, products)
+        else:
+            session.complete = True
+        return True
+
+    def get_result_browser_handler(self):
+        """Returns the handler for result paging buttons, usable in any conversation state"""
+        return CallbackQueryHandler(self.handle_result_page, pattern="^page_")
+
+    async def _lookup_inline_results(self, search_term):
+        """Best cached product per distinct deal for an inline query, best rated first"""
+        results = await self.marketplace_manager.get_cached_results_async(search_term)
+        if not results:
+            return []
+        groups = self.marketplace_manager.group_duplicate_results(results)
+        best_groups = top_k(
+            groups, MAX_INLINE_RESULTS,
+            scorer=lambda g: max(rating_score(p) for p in g['products'])
+        )
+        return [group['best'] for group in best_groups]
+
+    async def handle_inline_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Answer `@bot <query>` from cached results only, within INLINE_LATENCY_BUDGET"""
+        inline_query = update.inline_query
+        search_term = inline_query.query.strip()
+        if len(search_term) < settings.INLINE_MIN_QUERY_LENGTH:
+            await inline_query.answer([], cache_time=0)
+            return
+
+        try:
+            products = await asyncio.wait_for(
+                self._lookup_inline_results(search_term), timeout=settings.INLINE_LATENCY_BUDGET
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Inline lookup for '{search_term}' exceeded the latency budget")
+            products = []
+
+        if not products:
+            self._schedule_inline_fetch(inline_query.from_user.id, search_term)
+            await inline_query.answer(
+                [],
+                cache_time=0,
+                button=InlineQueryResultsButton(
+                    text="🔍 Searching... try again in a moment", start_parameter="inline"
+                )
+            )
+            return
+
+        articles = []
+        for index, product in enumerate(products):
+            message, url = format_product_message(product)
+            reply_markup = None
+            if url:
+                reply_markup = InlineKeyboardMarkup([[InlineKeyboardButton("🛒 View Product", url=url)]])
+            articles.append(InlineQueryResultArticle(
+                id=str(index),
+                title=product['title'][:100],
+                description=f"{product.get('price', 'N/A')} · {product.get('marketplace', '')}",
+                input_message_content=InputTextMessageContent(
+                    f"🏪 **{product.get('marketplace', '')}**\n{message}", parse_mode="Markdown"
+                ),
+                reply_markup=reply_markup
+            ))
+        await inline_query.answer(articles, cache_time=settings.INLINE_CACHE_TIME)
+
+    def _schedule_inline_fetch(self, user_id, search_term):
+        """
+        Fetches an unseen inline query in the background so a retry moments later hits the cache.
+        The fetch waits INLINE_FETCH_DELAY first and is replaced if the user keeps typing.
+        """
+        pending = self._inline_fetches.get(user_id)
+        if pending is not None and not pending.done():
+            pending.cancel()
+        self._inline_fetches[user_id] = asyncio.get_running_loop().create_task(
+            self._inline_fetch(user_id, search_term)
+        )
+
+    async def _inline_fetch(self, user_id, search_term):
+        try:
+            await asyncio.sleep(settings.INLINE_FETCH_DELAY)
+            # Prefetches have their own scheduler key, so they never use up the quota
+            # the user needs for searches in chat
+            ticket = self.search_scheduler.submit(
+                ('inline', user_id), self.marketplace_manager.search_all_marketplaces_async, search_term,
+                priority=PRIORITY_BACKGROUND, marketplaces=settings.INLINE_PREFETCH_MARKETPLACES
+            )
+        except asyncio.CancelledError:
+            return
+        except (UserQuotaExceededError, SchedulerBusyError) as e:
+            logger.debug(f"Skipping inline prefetch for '{search_term}': {str(e)}")
+            return
+        finally:
+            if self._inline_fetches.get(user_id) is asyncio.current_task():
+                del self._inline_fetches[user_id]
+
+        try:
+            await ticket
+            logger.info(f"Prefetched inline query '{search_term}' for user {user_id}")
+        except Exception as e:
+            logger.error(f"Error prefetching inline query '{search_term}': {str(e)}")
+
+    def get_inline_query_handler(self):
+        """Returns the inline query handler (`@bot air fryer` in any chat)"""
+        return InlineQueryHandler(self.handle_inline_query)
+
+    async def profile_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Admin-only /profile command.
+        Usage: /profile [on|off|status] [sample_rate] [slow_threshold_seconds]
+        """
+        user = update.effective_user
+        if user is None or user.id not in settings.ADMIN_USER_IDS:
+            logger.warning(f"Non-admin user {user.id if user else None} tried /profile")
+            return
+
+        args = context.args or []
+        action = args[0].lower() if args else 'status'
+        try:
+            if action == 'on':
+                if len(args) > 1:
+                    self.profiler.sample_rate = float(args[1])
+                if len(args) > 2:
+                    self.profiler.slow_threshold = float(args[2])
+                self.profiler.enabled = True
+            elif action == 'off':
+                self.profiler.enabled = False
+            elif action != 'status':
+                raise ValueError(action)
+        except ValueError:
+            await update.message.reply_text("Usage: /profile [on|off|status] [sample_rate] [slow_threshold_seconds]")
+            return
+
+        status = self.profiler.status()
+        await update.message.reply_text(
+            "📈 Profiler: " + ", ".join(f"{key}={value}" for key, value in status.items())
+        )
+
     async def return_to_main_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Return to main menu with Find button"""
         await update.message.reply_text(
@@ -295,6 +669,7 @@ class BestDealHandler:
                 CHOOSING_MARKETPLACE: [
                     CallbackQueryHandler(self.marketplace_choice, pattern="^search_"),
                     CallbackQueryHandler(self.handle_marketplace_selection, pattern="^market_"),
+                    CallbackQueryHandler(self.handle_region_selection, pattern="^region_"),
                     CallbackQueryHandler(self.handle_back_to_search_options, pattern="^back_to_search_options$")
                 ],
                 ENTERING_SEARCH: [
@@ -303,5 +678,7 @@ class BestDealHandler:
                 ]
             },
             fallbacks=[CommandHandler('cancel', self.cancel)],
-            allow_reentry=True
+            allow_reentry=True,
+            # Idle conversations are dropped so the state map stays bounded
+            conversation_timeout=settings.SESSION_IDLE_TIMEOUT
         )
\ No newline at end of file
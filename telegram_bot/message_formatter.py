@@ -34,4 +34,21 @@ def format_product_message(product):
 **Price:** {product['price']}
 **Rating:** {rating_stars} {reviews}
 """
-    return message, url
\ No newline at end of file
+    return message, url
+
+def format_deal_group_message(group):
+    """
+    Formats a group of duplicate listings: the best listing (see
+    group_duplicate_listings) plus where else it is sold.
+    """
+    best = group['best']
+    message, url = format_product_message(best)
+
+    others = [
+        f"{escape_markdown(product.get('marketplace', ''))} ({escape_markdown(product.get('price', 'N/A'))})"
+        for product in group['products'][1:]
+        if product.get('marketplace') != best.get('marketplace')
+    ]
+    if others:
+        message += f"**Also on:** {', '.join(others)}\n"
+    return message, url
@@ -0,0 +1,144 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from config import settings
+from utils.ranking import top_k
+from utils.scoring import extract_price, price_currency
+
+
+class ProductRecord:
+    """Compact copy of the product fields needed to render a result page"""
+
+    __slots__ = (
+        'title', 'price', 'price_value', 'currency', 'url', 'marketplace', 'region', 'rating', 'reviews_count'
+    )
+
+    def __init__(self, product):
+        self.title = product.get('title', '')
+        self.price = product.get('price', 'N/A')
+        self.price_value = extract_price(self.price)
+        self.currency = price_currency(product)
+        self.url = product.get('url', '')
+        self.marketplace = product.get('marketplace', '')
+        self.region = product.get('region')
+        self.rating = float(product.get('rating', 0) or 0)
+        self.reviews_count = product.get('reviews_count') or product.get('review_count') or 0
+
+    def to_product(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class ResultSession:
+    """
+    Fetched results of one search in a chat and the page being viewed.
+    `id` goes into the result message's callback data, so every result message
+    pages through its own results. `search` is the (marketplace, search term, region)
+    that produced them, used to fetch a full-size result list on "Show more";
+    `complete` is set once it has.
+    """
+
+    __slots__ = ('id', 'chat_id', 'records', 'position', 'sort', 'touched_at', 'search', 'complete')
+
+    SORT_KEYS = {
+        'rating': lambda record: -record.rating,
+        'price': lambda record: record.price_value,
+    }
+
+    def __init__(self, chat_id, records, search=None, complete=True):
+        self.id = secrets.token_urlsafe(6)
+        self.chat_id = chat_id
+        self.records = records
+        self.position = 0
+        self.sort = 'rating'
+        self.touched_at = time.monotonic()
+        self.search = search
+        self.complete = complete
+
+    def sort_by(self, sort):
+        self.records.sort(key=self.SORT_KEYS[sort])
+        self.sort = sort
+        self.position = 0
+
+    def move(self, step):
+        self.position = max(0, min(len(self.records) - 1, self.position + step))
+
+    @property
+    def price_sortable(self):
+        """Prices can only be ordered when every record has the same known currency"""
+        currencies = {record.currency for record in self.records}
+        return len(currencies) == 1 and None not in currencies
+
+    @property
+    def current(self):
+        return self.records[self.position]
+
+
+class ResultStore:
+    """
+    Store of already fetched results, one session per result message, so paging
+    and re-sorting need no marketplace calls. Bounded in sessions (LRU) and records
+    per session, with TTL eviction.
+    """
+
+    def __init__(self, ttl=None, max_sessions=None, max_records=None):
+        self.ttl = settings.RESULT_STORE_TTL if ttl is None else ttl
+        self.max_sessions = settings.RESULT_STORE_MAX_SESSIONS if max_sessions is None else max_sessions
+        self.max_records = settings.RESULT_STORE_MAX_RECORDS if max_records is None else max_records
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _records(self, products):
+        best = top_k((product for product in products if product), self.max_records, scorer='rating')
+        return [ProductRecord(product) for product in best]
+
+    def save(self, chat_id, products, search=None, complete=True):
+        """Stores a search's results, best rated first, and returns the new session"""
+        session = ResultSession(chat_id, self._records(products), search=search, complete=complete)
+
+        with self._lock:
+            self._sessions[session.id] = session
+            self._evict(time.monotonic())
+        return session
+
+    def reload(self, session, products):
+        """
+        Replaces a session's records with a larger fetch of the same search, keeping
+        the sort order and the product being viewed
+        """
+        current_url = session.current.url if session.records else None
+        session.records = self._records(products)
+        session.complete = True
+        if session.sort != 'rating':
+            session.records.sort(key=ResultSession.SORT_KEYS[session.sort])
+        urls = [record.url for record in session.records]
+        session.position = urls.index(current_url) if current_url in urls else 0
+        return session
+
+    def get(self, session_id, chat_id):
+        """Returns the chat's session with this id, or None if there is none or it expired"""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.chat_id != chat_id:
+                return None
+            if now - session.touched_at >= self.ttl:
+                del self._sessions[session_id]
+                return None
+            session.touched_at = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def _evict(self, now):
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        # Least recently used sessions are at the front, so expired ones come first
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.touched_at < self.ttl:
+                break
+            del self._sessions[session_id]
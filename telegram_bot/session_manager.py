@@ -0,0 +1,139 @@
+import logging
+import random
+import sys
+import time
+from collections import OrderedDict
+
+from telegram import Update
+from telegram.ext import ContextTypes, ConversationHandler, TypeHandler
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Sessions measured when estimating memory use
+SIZE_SAMPLE = 200
+
+
+def approximate_size(obj, seen=None):
+    """Rough deep size in bytes of plain Python containers"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approximate_size(k, seen) + approximate_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approximate_size(item, seen) for item in obj)
+    return size
+
+
+def end_conversation(conversation, chat_id, user_id):
+    """
+    Ends a user's state in a ConversationHandler (keyed per chat and user, not per
+    message) and cancels its timeout job. PTB has no public API for ending a
+    conversation from outside a callback, so this uses the handler's own state update.
+    """
+    if conversation.per_message or (conversation.per_chat and chat_id is None):
+        return
+    key = tuple(
+        part for part, used in ((chat_id, conversation.per_chat), (user_id, conversation.per_user)) if used
+    )
+    conversation._update_state(ConversationHandler.END, key)
+    timeout_job = conversation.timeout_jobs.pop(key, None)
+    if timeout_job is not None:
+        timeout_job.schedule_removal()
+
+
+class SessionManager:
+    """
+    Keeps per-user memory bounded for a long-running bot. Every update marks its
+    user and chat as active; a periodic sweep drops `user_data` / `chat_data` of
+    sessions idle longer than the TTL, and of the least recently active ones when
+    more than `max_sessions` are tracked. Conversation states expire through the
+    ConversationHandler's conversation_timeout, which uses the same TTL; users
+    evicted over the cap also have their state ended in the registered
+    conversations, so the cap bounds both stores.
+    """
+
+    def __init__(self, idle_ttl=None, max_sessions=None, sweep_interval=None):
+        self.idle_ttl = settings.SESSION_IDLE_TIMEOUT if idle_ttl is None else idle_ttl
+        self.max_sessions = settings.SESSION_MAX_TRACKED if max_sessions is None else max_sessions
+        self.sweep_interval = settings.SESSION_SWEEP_INTERVAL if sweep_interval is None else sweep_interval
+        # user_id -> (chat_id, last_seen), least recently active first
+        self._sessions = OrderedDict()
+        self.evicted = 0
+        self.conversations = []
+
+    def __len__(self):
+        return len(self._sessions)
+
+    async def track(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Records activity for the update's user"""
+        user = update.effective_user
+        if user is None:
+            return
+        chat = update.effective_chat
+        self._sessions[user.id] = (chat.id if chat else None, time.monotonic())
+        self._sessions.move_to_end(user.id)
+
+    def _expired(self, now):
+        """Yields sessions to evict: idle ones, then the oldest over the cap"""
+        over_cap = len(self._sessions) - self.max_sessions
+        for user_id, (chat_id, last_seen) in self._sessions.items():
+            if over_cap > 0:
+                over_cap -= 1
+            elif now - last_seen < self.idle_ttl:
+                break
+            yield user_id, chat_id
+
+    async def sweep(self, context: ContextTypes.DEFAULT_TYPE):
+        """Job callback that evicts idle and over-cap sessions, then logs a report"""
+        application = context.application
+        expired = list(self._expired(time.monotonic()))
+        for user_id, chat_id in expired:
+            del self._sessions[user_id]
+            application.drop_user_data(user_id)
+            # Private chats share the user's id; group chat data is left alone
+            if chat_id == user_id:
+                application.drop_chat_data(chat_id)
+            for conversation in self.conversations:
+                end_conversation(conversation, chat_id, user_id)
+        self.evicted += len(expired)
+        if expired:
+            logger.info(f"Evicted {len(expired)} idle sessions")
+        logger.info(f"Session report: {self.report(application)}")
+
+    def report(self, application):
+        """Returns tracked session count and approximate bytes held in user_data/chat_data"""
+        user_data = application.user_data
+        chat_data = application.chat_data
+        stored = len(user_data) + len(chat_data)
+
+        sample = random.sample(list(self._sessions), min(SIZE_SAMPLE, len(self._sessions)))
+        sampled_bytes = sum(
+            approximate_size(user_data.get(user_id, {})) + approximate_size(chat_data.get(user_id, {}))
+            for user_id in sample
+        )
+        approx_bytes = int(sampled_bytes / len(sample) * len(self._sessions)) if sample else 0
+        return {
+            'sessions': len(self._sessions),
+            'stored_user_data': len(user_data),
+            'stored_chat_data': len(chat_data),
+            'stored_total': stored,
+            'approx_bytes': approx_bytes,
+            'evicted': self.evicted,
+        }
+
+    def register(self, application, conversations=()):
+        """
+        Adds the activity tracker (before all other handlers) and the periodic sweep.
+        Evicted users' states are ended in `conversations` (ConversationHandlers).
+        """
+        self.conversations = list(conversations)
+        application.add_handler(TypeHandler(Update, self.track), group=-1)
+        application.job_queue.run_repeating(
+            self.sweep, interval=self.sweep_interval, first=self.sweep_interval, name="session-sweep"
+        )
@@ -0,0 +1,327 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from urllib.parse import urlsplit
+
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import CommandHandler, ContextTypes
+
+from config import settings
+from marketplace_api import PRIORITY_BACKGROUND
+from utils.query_normalizer import normalize_query
+from utils.ranking import best_product
+from utils.scoring import extract_price, price_text
+from .message_formatter import escape_markdown
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watches (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    chat_id INTEGER NOT NULL,
+    marketplace TEXT NOT NULL,
+    region TEXT NOT NULL,
+    query TEXT NOT NULL,
+    search_query TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    UNIQUE (chat_id, marketplace, region, query)
+);
+CREATE INDEX IF NOT EXISTS watches_query ON watches (marketplace, region, query);
+CREATE TABLE IF NOT EXISTS watch_listings (
+    marketplace TEXT NOT NULL,
+    region TEXT NOT NULL,
+    query TEXT NOT NULL,
+    listing_key TEXT NOT NULL,
+    title TEXT NOT NULL,
+    url TEXT NOT NULL,
+    price TEXT,
+    price_value REAL,
+    checked_at REAL,
+    PRIMARY KEY (marketplace, region, query)
+);
+"""
+
+
+def listing_key(product):
+    """Stable identity of a listing across searches: the ASIN, else the URL without query string"""
+    if product.get('asin'):
+        return f"asin:{product['asin']}"
+    url = urlsplit(product.get('url') or '')
+    return f"{url.netloc.lower()}{url.path.rstrip('/')}"
+
+
+class WatchStore:
+    """SQLite storage for price watches and the listing each watched query tracks"""
+
+    def __init__(self, path=None):
+        self.path = settings.WATCH_DB_PATH if path is None else path
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def add(self, user_id, chat_id, marketplace, region, query, search_query):
+        """Adds a watch; returns False if the chat already watches this query"""
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO watches "
+                "(user_id, chat_id, marketplace, region, query, search_query, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (user_id, chat_id, marketplace, region, query, search_query, time.time())
+            )
+            return cursor.rowcount > 0
+
+    def remove(self, user_id, watch_id):
+        """Removes a user's watch; returns (marketplace, region, query, search_query) or None"""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT marketplace, region, query, search_query FROM watches WHERE id = ? AND user_id = ?",
+                (watch_id, user_id)
+            ).fetchone()
+            if row:
+                connection.execute("DELETE FROM watches WHERE id = ?", (watch_id,))
+                remaining = connection.execute(
+                    "SELECT 1 FROM watches WHERE marketplace = ? AND region = ? AND query = ?", row[:3]
+                ).fetchone()
+                if remaining is None:
+                    connection.execute(
+                        "DELETE FROM watch_listings WHERE marketplace = ? AND region = ? AND query = ?", row[:3]
+                    )
+            return row
+
+    def count_for_user(self, user_id):
+        with self._connect() as connection:
+            return connection.execute("SELECT COUNT(*) FROM watches WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+    def list_for_user(self, user_id):
+        """(id, marketplace, search_query, tracked title or None, tracked price or None) per watch"""
+        with self._connect() as connection:
+            return connection.execute(
+                "SELECT w.id, w.marketplace, w.search_query, l.title, l.price FROM watches w "
+                "LEFT JOIN watch_listings l "
+                "ON l.marketplace = w.marketplace AND l.region = w.region AND l.query = w.query "
+                "WHERE w.user_id = ? ORDER BY w.id", (user_id,)
+            ).fetchall()
+
+    def distinct_queries(self):
+        """Every watched (marketplace, region, query, search_query), however many subscribers each has"""
+        with self._connect() as connection:
+            return connection.execute(
+                "SELECT marketplace, region, query, MIN(search_query) FROM watches "
+                "GROUP BY marketplace, region, query"
+            ).fetchall()
+
+    def subscribers(self, marketplace, region, query):
+        with self._connect() as connection:
+            return [chat_id for (chat_id,) in connection.execute(
+                "SELECT DISTINCT chat_id FROM watches WHERE marketplace = ? AND region = ? AND query = ?",
+                (marketplace, region, query)
+            )]
+
+    def tracked_listing(self, marketplace, region, query):
+        """(listing_key, title, url, price, price_value) of the tracked listing, or None before the first check"""
+        with self._connect() as connection:
+            return connection.execute(
+                "SELECT listing_key, title, url, price, price_value FROM watch_listings "
+                "WHERE marketplace = ? AND region = ? AND query = ?",
+                (marketplace, region, query)
+            ).fetchone()
+
+    def save_listing(self, marketplace, region, query, product, price_value):
+        """Records the tracked listing and its latest price"""
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO watch_listings "
+                "(marketplace, region, query, listing_key, title, url, price, price_value, checked_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (marketplace, region, query, listing_key(product), product.get('title', ''),
+                 product.get('url', ''), price_text(product.get('price')), price_value, time.time())
+            )
+
+
+class PriceWatcher:
+    """
+    /watch, /unwatch and /watches commands plus the JobQueue checks behind them.
+
+    The first check of a watched query pins one listing, the best overall pick by
+    calculate_score (not the cheapest match, which is usually an accessory). Later
+    checks compare that same listing's price, so an alert always means the watched
+    listing got cheaper. Watches on the same normalized (marketplace, region, query)
+    share one repeating job and one actor run per check, and alerts fan out to
+    every subscriber. Each job's first run is offset within the interval so checks
+    don't burst.
+    """
+
+    def __init__(self, marketplace_manager, store=None, interval=None):
+        self.marketplace_manager = marketplace_manager
+        self.store = WatchStore() if store is None else store
+        self.interval = settings.WATCH_INTERVAL if interval is None else interval
+        self.job_queue = None
+
+    @staticmethod
+    def _job_name(marketplace, region, query):
+        return f"watch:{marketplace}:{region}:{query}"
+
+    def _schedule(self, marketplace, region, query, search_query):
+        name = self._job_name(marketplace, region, query)
+        if self.job_queue is None or self.job_queue.get_jobs_by_name(name):
+            return
+        # Stable offset within the interval spreads the checks evenly
+        first = zlib.crc32(name.encode('utf-8')) % self.interval
+        self.job_queue.run_repeating(
+            self.check_watch, interval=self.interval, first=first, name=name,
+            data=(marketplace, region, query, search_query)
+        )
+
+    def _unschedule(self, marketplace, region, query):
+        if self.job_queue is None:
+            return
+        for job in self.job_queue.get_jobs_by_name(self._job_name(marketplace, region, query)):
+            job.schedule_removal()
+
+    async def start(self, job_queue):
+        """Schedules one job per distinct watched query"""
+        self.job_queue = job_queue
+        queries = await asyncio.to_thread(self.store.distinct_queries)
+        for marketplace, region, query, search_query in queries:
+            self._schedule(marketplace, region, query, search_query)
+        logger.info(f"Scheduled price checks for {len(queries)} watched queries")
+
+    async def check_watch(self, context: ContextTypes.DEFAULT_TYPE):
+        """Job callback: one search per watched query, alerts fan out to all subscribers"""
+        marketplace, region, query, search_query = context.job.data
+        try:
+            # Full-depth search, so the tracked listing is found even if it ranks low today
+            products = await self.marketplace_manager.search_marketplace_async(
+                marketplace, search_query, region or None,
+                max_items=settings.RESULT_BUDGET_MAX_ITEMS, priority=PRIORITY_BACKGROUND
+            )
+        except Exception as e:
+            logger.error(f"Error checking watch '{search_query}' on {marketplace}: {str(e)}")
+            return
+
+        # Amazon prices are dicts; extract_price reads their value
+        priced = [p for p in products if extract_price(p.get('price')) != float('inf')]
+        tracked = await asyncio.to_thread(self.store.tracked_listing, marketplace, region, query)
+        if tracked is None:
+            pick = best_product(priced, scorer='score')
+            if pick is not None:
+                await asyncio.to_thread(
+                    self.store.save_listing, marketplace, region, query, pick, extract_price(pick.get('price'))
+                )
+                logger.info(f"Watch '{search_query}' on {marketplace} now tracks '{pick.get('title')}'")
+            return
+
+        key, _, _, previous_text, previous = tracked
+        current = next((p for p in priced if listing_key(p) == key), None)
+        if current is None:
+            logger.info(f"Tracked listing for '{search_query}' on {marketplace} not in this check's results")
+            return
+
+        price = extract_price(current.get('price'))
+        await asyncio.to_thread(self.store.save_listing, marketplace, region, query, current, price)
+        if previous is None or price >= previous:
+            return
+
+        subscribers = await asyncio.to_thread(self.store.subscribers, marketplace, region, query)
+        marketplace_name = self.marketplace_manager.get_marketplace_display_name(marketplace)
+        text = (
+            f"📉 **Price drop on {escape_markdown(marketplace_name)}**\n"
+            f"**Product:** {escape_markdown(current.get('title'))}\n"
+            f"**Price:** {escape_markdown(previous_text)} → {escape_markdown(price_text(current.get('price')))}\n"
+            f"Same listing you're watching for \"{escape_markdown(search_query)}\"."
+        )
+        reply_markup = None
+        if current.get('url'):
+            reply_markup = InlineKeyboardMarkup([[InlineKeyboardButton("🛒 View Product", url=current['url'])]])
+        for chat_id in subscribers:
+            try:
+                await context.bot.send_message(
+                    chat_id=chat_id, text=text, parse_mode="Markdown", reply_markup=reply_markup
+                )
+            except Exception as e:
+                logger.error(f"Error sending price alert to {chat_id}: {str(e)}")
+        logger.info(f"Sent price drop alert for '{search_query}' on {marketplace} to {len(subscribers)} chats")
+
+    async def watch_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/watch <marketplace> <product> - get notified when the tracked listing gets cheaper"""
+        marketplaces = self.marketplace_manager.get_available_marketplaces()
+        args = context.args or []
+        if len(args) < 2 or args[0].lower() not in marketplaces:
+            await update.message.reply_text(
+                f"Usage: /watch <marketplace> <product>\nMarketplaces: {', '.join(marketplaces)}"
+            )
+            return
+
+        marketplace = args[0].lower()
+        text = ' '.join(args[1:])
+        query = normalize_query(text)
+        if not query:
+            await update.message.reply_text("Please tell me which product to watch.")
+            return
+        search_query = text.strip()
+        # Watches are keyed on the resolved default region, like searches
+        region = self.marketplace_manager.clients[marketplace].resolve_options().region or ''
+
+        user_id = update.effective_user.id
+        if await asyncio.to_thread(self.store.count_for_user, user_id) >= settings.WATCH_MAX_PER_USER:
+            await update.message.reply_text(
+                f"You can watch up to {settings.WATCH_MAX_PER_USER} products. Remove one with /unwatch first."
+            )
+            return
+
+        added = await asyncio.to_thread(
+            self.store.add, user_id, update.effective_chat.id, marketplace, region, query, search_query
+        )
+        if added:
+            self._schedule(marketplace, region, query, search_query)
+        marketplace_name = self.marketplace_manager.get_marketplace_display_name(marketplace)
+        await update.message.reply_text(
+            f"👀 Watching \"{search_query}\" on {marketplace_name}. I'll pick the best listing on the "
+            f"first check and message you when that listing's price drops (see /watches)."
+            if added else f"You're already watching \"{search_query}\" on {marketplace_name}."
+        )
+
+    async def unwatch_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/unwatch <id> - stop a watch (ids are shown by /watches)"""
+        args = context.args or []
+        if len(args) != 1 or not args[0].isdigit():
+            await update.message.reply_text("Usage: /unwatch <id> (see /watches)")
+            return
+
+        removed = await asyncio.to_thread(self.store.remove, update.effective_user.id, int(args[0]))
+        if removed is None:
+            await update.message.reply_text("No such watch.")
+            return
+        marketplace, region, query, search_query = removed
+        if not await asyncio.to_thread(self.store.subscribers, marketplace, region, query):
+            self._unschedule(marketplace, region, query)
+        await update.message.reply_text(f"Stopped watching \"{search_query}\".")
+
+    async def watches_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/watches - list your price watches and the listing each one tracks"""
+        watches = await asyncio.to_thread(self.store.list_for_user, update.effective_user.id)
+        if not watches:
+            await update.message.reply_text("You're not watching anything. Use /watch <marketplace> <product>.")
+            return
+        lines = []
+        for watch_id, marketplace, search_query, title, price in watches:
+            line = f"{watch_id}. {search_query} ({self.marketplace_manager.get_marketplace_display_name(marketplace)})"
+            line += f"\n    tracking: {title} - {price}" if title else "\n    tracking: picked on the next check"
+            lines.append(line)
+        await update.message.reply_text("👀 Your watches:\n" + "\n".join(lines))
+
+    def get_handlers(self):
+        return [
+            CommandHandler('watch', self.watch_command),
+            CommandHandler('unwatch', self.unwatch_command),
+            CommandHandler('watches', self.watches_command),
+        ]
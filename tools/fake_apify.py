@@ -0,0 +1,264 @@
+"""
+Local stand-in for the parts of the Apify API the bot uses, so the webhook flow
+(start run -> completion webhook -> resume search) can be exercised offline.
+
+    python -m tools.fake_apify [--port 8765] [--run-seconds 1]
+        Serves the fake API; point the bot at it with APIFY_API_URL=http://127.0.0.1:8765
+
+    python -m tools.fake_apify --check
+        Starts the fake API and runs a Search All in webhook mode, plus one blocking
+        search, against it, then reports what happened
+
+Every actor run "finishes" after --run-seconds with a dataset of generic items
+that all marketplace field mappings accept, and then POSTs the standard webhook
+payload to each ad-hoc webhook registered with the run.
+"""
+import argparse
+import asyncio
+import base64
+import gzip
+import json
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timezone
+from itertools import count
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+_REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found'}
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+def _dataset_items(actor_id, run_input, size):
+    """Generic items carrying every field name the marketplace clients read"""
+    query = (run_input.get('searchQueries') or [run_input.get('search') or 'product'])[0]
+    return [
+        {
+            'title': f"{query} {index}", 'name': f"{query} {index}",
+            'price': f"${10 + index}.99", 'prices': f"KSh {1300 + index * 100}",
+            'url': f"https://example.com/{actor_id.replace('/', '-')}/{index}",
+            'productUrl': f"https://example.com/{actor_id.replace('/', '-')}/{index}",
+            'asin': f"B0FAKE{index:04d}", 'rating': round(3 + (index % 20) / 10, 1),
+            'reviewsCount': index * 7, 'reviewCount': index * 7,
+        }
+        for index in range(size)
+    ]
+
+
+class FakeApify:
+    """Minimal in-process Apify API: runs, datasets and ad-hoc run webhooks"""
+
+    def __init__(self, run_seconds=1.0):
+        self.run_seconds = run_seconds
+        self.runs = {}
+        self.datasets = {}
+        self.webhooks_sent = 0
+        self.runs_started = 0
+        self._ids = count(1)
+        self._server = None
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1] if self._server else None
+
+    async def start(self, host='127.0.0.1', port=0):
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        logger.info(f"Fake Apify API on http://{host}:{self.port}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def _start_run(self, actor_id, params, run_input):
+        number = next(self._ids)
+        run = {
+            'id': f"fakerun{number}", 'actId': actor_id, 'status': 'RUNNING',
+            'startedAt': _now_iso(), 'finishedAt': None, 'defaultDatasetId': f"fakeds{number}",
+        }
+        self.runs[run['id']] = run
+        self.runs_started += 1
+        size = int(run_input.get('maxItems') or run_input.get('maxProducts')
+                   or run_input.get('maxItemsPerStartUrl') or 20)
+        webhooks = []
+        if params.get('webhooks'):
+            webhooks = json.loads(base64.b64decode(params['webhooks'][0]))
+        asyncio.get_running_loop().create_task(
+            self._finish_run(run, _dataset_items(actor_id, run_input, size), webhooks)
+        )
+        return run
+
+    async def _finish_run(self, run, items, webhooks):
+        await asyncio.sleep(self.run_seconds)
+        self.datasets[run['defaultDatasetId']] = items
+        run.update(status='SUCCEEDED', finishedAt=_now_iso())
+        for webhook in webhooks:
+            event_types = webhook.get('eventTypes') or webhook.get('event_types') or []
+            if 'ACTOR.RUN.SUCCEEDED' not in event_types:
+                continue
+            payload = {
+                'createdAt': _now_iso(), 'eventType': 'ACTOR.RUN.SUCCEEDED',
+                'eventData': {'actorId': run['actId'], 'actorRunId': run['id']}, 'resource': dict(run),
+            }
+            await self._post(webhook.get('requestUrl') or webhook.get('request_url'), payload)
+
+    async def _post(self, url, payload):
+        target = urlsplit(url)
+        body = json.dumps(payload).encode('utf-8')
+        path = target.path + (f"?{target.query}" if target.query else '')
+        try:
+            reader, writer = await asyncio.open_connection(target.hostname, target.port or 80)
+            writer.write(
+                f"POST {path} HTTP/1.1\r\nHost: {target.netloc}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body
+            )
+            await writer.drain()
+            status_line = await reader.readline()
+            writer.close()
+            self.webhooks_sent += 1
+            logger.info(f"Webhook for {payload['eventData']['actorRunId']} -> {status_line.decode().strip()}")
+        except OSError as e:
+            logger.error(f"Webhook delivery to {url} failed: {str(e)}")
+
+    async def _route(self, method, target, body):
+        """Returns (status, JSON-able body, extra headers)"""
+        url = urlsplit(target)
+        params = parse_qs(url.query)
+        parts = [part for part in url.path.split('/') if part]
+        if parts[:1] == ['v2']:
+            parts = parts[1:]
+
+        if method == 'POST' and len(parts) == 3 and parts[0] == 'acts' and parts[2] == 'runs':
+            run_input = json.loads(body) if body else {}
+            return 201, {'data': self._start_run(parts[1].replace('~', '/'), params, run_input)}, {}
+
+        if method == 'GET' and len(parts) == 2 and parts[0] == 'actor-runs':
+            run = self.runs.get(parts[1])
+            if run is None:
+                return 404, {'error': {'type': 'record-not-found', 'message': 'Run not found'}}, {}
+            deadline = time.monotonic() + float(params.get('waitForFinish', ['0'])[0])
+            while run['status'] == 'RUNNING' and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            return 200, {'data': dict(run)}, {}
+
+        if method == 'GET' and len(parts) == 3 and parts[0] == 'datasets' and parts[2] == 'items':
+            items = self.datasets.get(parts[1])
+            if items is None:
+                return 404, {'error': {'type': 'record-not-found', 'message': 'Dataset not found'}}, {}
+            fields = [f for value in params.get('fields', []) for f in value.split(',') if f]
+            if fields:
+                items = [{key: item[key] for key in fields if key in item} for item in items]
+            offset = int(params.get('offset', ['0'])[0])
+            limit = int(params.get('limit', [str(len(items))])[0])
+            page = items[offset:offset + limit]
+            headers = {
+                'X-Apify-Pagination-Total': len(items), 'X-Apify-Pagination-Offset': offset,
+                'X-Apify-Pagination-Count': len(page), 'X-Apify-Pagination-Limit': limit,
+                'X-Apify-Pagination-Desc': 'false',
+            }
+            return 200, page, headers
+
+        return 404, {'error': {'type': 'page-not-found', 'message': f"{method} {url.path}"}}, {}
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            method, target, _ = (await reader.readline()).decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+            # apify-client gzips request bodies
+            if headers.get('content-encoding') == 'gzip':
+                body = gzip.decompress(body)
+            status, payload, extra = await self._route(method, target, body)
+        except (ValueError, OSError, asyncio.IncompleteReadError) as e:
+            status, payload, extra = 400, {'error': {'type': 'invalid-request', 'message': str(e)}}, {}
+        data = json.dumps(payload).encode('utf-8')
+        head = f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: application/json\r\n"
+        head += ''.join(f"{name}: {value}\r\n" for name, value in extra.items())
+        head += f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n"
+        try:
+            writer.write(head.encode('latin-1') + data)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def check(run_seconds):
+    """Runs a webhook-mode Search All and one blocking search against the fake API"""
+    fake = FakeApify(run_seconds)
+    await fake.start()
+    webhook_port = _free_port()
+    # Settings are read at import time, so configure the bot before importing it
+    os.environ.update({
+        'APIFY_API_URL': f"http://127.0.0.1:{fake.port}",
+        'APIFY_API_TOKEN': os.environ.get('APIFY_API_TOKEN') or 'fake-token',
+        'APIFY_WEBHOOK_ENABLED': 'true',
+        'APIFY_WEBHOOK_HOST': '127.0.0.1',
+        'APIFY_WEBHOOK_PORT': str(webhook_port),
+        'APIFY_WEBHOOK_PUBLIC_URL': f"http://127.0.0.1:{webhook_port}/apify/webhook",
+        'PRODUCT_INDEX_ENABLED': 'false',
+    })
+    from marketplace_api import MarketplaceManager
+
+    manager = MarketplaceManager(use_local_index=False)
+    await manager.start()
+    try:
+        started = time.monotonic()
+        results = await manager.search_all_marketplaces_async('air fryer')
+        elapsed = time.monotonic() - started
+        print(f"Search All (webhook mode): {({name: len(items) for name, items in results.items()})} "
+              f"in {elapsed:.1f}s, {fake.webhooks_sent} webhooks, {manager.run_waiter.in_flight} runs still waiting")
+
+        blocking = await asyncio.to_thread(manager.search_marketplace, 'temu', 'usb cable')
+        print(f"Blocking search: {len(blocking)} products, {fake.runs_started} runs started in total")
+
+        webhook_ok = all(results.values()) and fake.webhooks_sent == len(results)
+        ok = webhook_ok and blocking and manager.run_waiter.in_flight == 0
+        print("OK" if ok else "FAILED")
+        return ok
+    finally:
+        await manager.stop()
+        await fake.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake of the Apify API with run webhooks")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--run-seconds', type=float, default=1.0, help="how long each fake actor run takes")
+    parser.add_argument('--check', action='store_true', help="run the bot's searches against it and exit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.check:
+        raise SystemExit(0 if asyncio.run(check(args.run_seconds)) else 1)
+
+    async def serve():
+        fake = FakeApify(args.run_seconds)
+        await fake.start(args.host, args.port)
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+from utils.query_normalizer import normalize_query, numeric_tokens
+from utils.ranking import rating_score
+from utils.scoring import extract_price, price_currency
+from utils.similarity import LSHIndex, MinHasher, char_shingles, jaccard
+
+DEFAULT_TITLE_SIMILARITY = 0.7
+
+_hasher = MinHasher(num_perm=64)
+
+
+def _find(parents, i):
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+
+def group_duplicate_listings(products, threshold=DEFAULT_TITLE_SIMILARITY):
+    """
+    Groups near-identical listings (same product across or within marketplaces).
+    Candidate pairs come from MinHash/LSH over normalized titles, so the cost is
+    near-linear in the number of products instead of comparing every pair.
+
+    Listings are only ranked by price when the whole group is priced in one known
+    currency; otherwise the best rated listing comes first.
+
+    Returns a list of groups, each a dict with:
+        'best': the cheapest listing of the group, or the best rated one
+        'products': all listings of the group, cheapest (or best rated) first
+        'marketplaces': marketplaces the product was found on
+        'currency': the group's currency code, or None if mixed or unknown
+    """
+    products = [p for p in products if p and p.get('title')]
+    if not products:
+        return []
+
+    titles = [normalize_query(p['title']) for p in products]
+    shingles = [char_shingles(title) for title in titles]
+    index = LSHIndex(num_perm=_hasher.num_perm, bands=16)
+    parents = list(range(len(products)))
+
+    for i, title in enumerate(titles):
+        signature = _hasher.signature(shingles[i])
+        # Listings with different model numbers or sizes are never merged
+        partition = numeric_tokens(title)
+        for j in index.candidates(signature, partition=partition):
+            if _find(parents, i) != _find(parents, j) and jaccard(shingles[i], shingles[j]) >= threshold:
+                parents[_find(parents, j)] = _find(parents, i)
+        index.insert(i, signature, partition=partition)
+
+    clusters = {}
+    for i in range(len(products)):
+        clusters.setdefault(_find(parents, i), []).append(products[i])
+
+    groups = []
+    for members in clusters.values():
+        currencies = {price_currency(product) for product in members}
+        currency = currencies.pop() if len(currencies) == 1 else None
+        if currency:
+            members.sort(key=lambda p: extract_price(p.get('price')))
+        else:
+            members.sort(key=rating_score, reverse=True)
+        marketplaces = []
+        for product in members:
+            if product.get('marketplace') and product['marketplace'] not in marketplaces:
+                marketplaces.append(product['marketplace'])
+        groups.append({
+            'best': members[0],
+            'products': members,
+            'marketplaces': marketplaces,
+            'currency': currency
+        })
+    return groups
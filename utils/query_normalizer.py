@@ -0,0 +1,38 @@
+import re
+import unicodedata
+
+# Letters glued to digits ("iphone15", "15pro") are split so they match the spaced form
+_ALPHA_DIGIT_BOUNDARY = re.compile(r'(?<=[^\W\d_])(?=\d)|(?<=\d)(?=[^\W\d_])')
+# Words and numbers; decimals like "5.8" stay one token so "5.8qt" never matches "8.5 qt"
+_TOKEN = re.compile(r'\d+(?:\.\d+)?|[^\W\d_]+')
+
+
+def query_tokens(query):
+    """
+    Splits a search query into its normalized tokens, in original order.
+    """
+    if not query:
+        return []
+
+    # Unicode normalization and accent folding ("Café" -> "cafe")
+    text = unicodedata.normalize('NFKD', str(query))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = text.casefold()
+
+    text = _ALPHA_DIGIT_BOUNDARY.sub(' ', text)
+    return _TOKEN.findall(text)
+
+
+def normalize_query(query):
+    """
+    Returns the canonical form of a search query, used as cache, index and budget key.
+    "iPhone 15 Pro", "iphone15 pro" and "pro iphone 15" all become "15 iphone pro".
+    """
+    return ' '.join(sorted(set(query_tokens(query))))
+
+
+def numeric_tokens(canonical_query):
+    """
+    Returns the numeric tokens of a canonical query (model numbers, sizes, ...)
+    """
+    return frozenset(token for token in canonical_query.split() if token[0].isdigit())
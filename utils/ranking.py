@@ -0,0 +1,73 @@
+import heapq
+from itertools import count
+
+from utils.scoring import calculate_score, extract_price
+
+
+def rating_score(product):
+    return float(product.get('rating', 0) or 0)
+
+
+def price_score(product):
+    """Cheaper is better; products without a parsable price rank last"""
+    return -extract_price(product.get('price'))
+
+
+SCORERS = {
+    'rating': rating_score,
+    'price': price_score,
+    'score': calculate_score,
+}
+
+
+def get_scorer(scorer):
+    """Accepts a scorer name from SCORERS or any callable(product) -> number"""
+    if callable(scorer):
+        return scorer
+    try:
+        return SCORERS[scorer]
+    except KeyError:
+        raise ValueError(f"Unknown scorer: {scorer}")
+
+
+class TopK:
+    """
+    Keeps the k best items seen so far in a bounded min-heap.
+    Memory stays O(k) however many items are pushed; ties keep the earlier item,
+    like max() does.
+    """
+
+    def __init__(self, k, scorer='rating'):
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        self.k = k
+        self.scorer = get_scorer(scorer)
+        self._heap = []
+        self._sequence = count()
+
+    def push(self, item):
+        entry = (self.scorer(item), -next(self._sequence), item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def extend(self, items):
+        for item in items:
+            self.push(item)
+        return self
+
+    def results(self):
+        """Best first"""
+        return [item for _, _, item in sorted(self._heap, key=lambda entry: entry[:2], reverse=True)]
+
+
+def top_k(items, k, scorer='rating'):
+    """Returns the k best items of any iterable, best first"""
+    return TopK(k, scorer).extend(items).results()
+
+
+def best_product(items, scorer='rating'):
+    """Returns the best item of any iterable, or None if it is empty"""
+    best = top_k(items, 1, scorer)
+    return best[0] if best else None
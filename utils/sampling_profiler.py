@@ -0,0 +1,199 @@
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Event loop delays above this count as stalls
+LOOP_STALL_THRESHOLD = 0.05
+LOOP_PROBE_INTERVAL = 0.05
+
+# Sampling decision of the search being handled, shared by all of its profiled stages
+_search_sampled = contextvars.ContextVar('profiler_search_sampled', default=None)
+
+
+class ProfileSession:
+    """Samples collected while one profiled operation was running"""
+
+    def __init__(self, name, sampled):
+        self.name = name
+        self.sampled = sampled
+        # Only the thread that opened the session is sampled
+        self.thread_id = threading.get_ident()
+        self.samples = Counter()
+        self.loop_stalls = []
+        self.started_at = time.monotonic()
+
+
+class SamplingProfiler:
+    """
+    Low-overhead stack-sampling profiler for production searches.
+    While at least one session is active, a background thread samples, at a fixed
+    interval, the stack of each session's own thread (not idle executor or writer
+    threads). A session is written out as a collapsed-stack file (input for
+    flamegraph.pl / speedscope) when its search was picked by the sample rate or it
+    ran longer than the slow threshold. The sample-rate decision is made once per
+    search (see search()), so all profiled stages of a picked search are written.
+    Event loop stalls seen by the loop monitor appear as an "[event loop stall]" stack.
+    """
+
+    def __init__(self, enabled=None, sample_rate=None, slow_threshold=None, interval=None,
+                 output_dir=None, max_files=None):
+        self.enabled = settings.PROFILER_ENABLED if enabled is None else enabled
+        self.sample_rate = settings.PROFILER_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.slow_threshold = settings.PROFILER_SLOW_THRESHOLD if slow_threshold is None else slow_threshold
+        self.interval = settings.PROFILER_INTERVAL if interval is None else interval
+        self.output_dir = settings.PROFILER_OUTPUT_DIR if output_dir is None else output_dir
+        self.max_files = settings.PROFILER_MAX_FILES if max_files is None else max_files
+
+        self._sessions = set()
+        self._lock = threading.Lock()
+        self._sampler = None
+        self.written = 0
+
+    @contextmanager
+    def search(self):
+        """
+        Makes the sample-rate decision once for the enclosed search; sessions opened
+        within it, including in its tasks and worker threads, share it
+        """
+        token = _search_sampled.set(self.enabled and random.random() < self.sample_rate)
+        try:
+            yield
+        finally:
+            _search_sampled.reset(token)
+
+    @contextmanager
+    def session(self, name):
+        """Profiles the enclosed block (sync or async code) when profiling is enabled"""
+        if not self.enabled:
+            yield None
+            return
+
+        sampled = _search_sampled.get()
+        if sampled is None:
+            sampled = random.random() < self.sample_rate
+        session = ProfileSession(name, sampled)
+        with self._lock:
+            self._sessions.add(session)
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+                self._sampler.start()
+        try:
+            yield session
+        finally:
+            with self._lock:
+                self._sessions.discard(session)
+            duration = time.monotonic() - session.started_at
+            if session.sampled or duration >= self.slow_threshold:
+                try:
+                    self._write(session, duration)
+                except OSError as e:
+                    logger.error(f"Error writing profile: {str(e)}")
+
+    def _sample_loop(self):
+        own_id = threading.get_ident()
+        while True:
+            with self._lock:
+                sessions = list(self._sessions)
+                if not sessions:
+                    self._sampler = None
+                    return
+
+            frames = sys._current_frames()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = {}
+            for session in sessions:
+                thread_id = session.thread_id
+                if thread_id not in stacks and thread_id in frames and thread_id != own_id:
+                    stacks[thread_id] = self._collapse(frames[thread_id], names.get(thread_id, str(thread_id)))
+                if thread_id in stacks:
+                    session.samples[stacks[thread_id]] += 1
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _collapse(frame, thread_name):
+        """Root-first 'thread;func (file:line);...' stack"""
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        frames.append(thread_name)
+        return ';'.join(reversed(frames))
+
+    async def monitor_event_loop(self):
+        """Background task that records event loop stalls into active sessions"""
+        while True:
+            expected = time.monotonic() + LOOP_PROBE_INTERVAL
+            await asyncio.sleep(LOOP_PROBE_INTERVAL)
+            lag = time.monotonic() - expected
+            if lag > LOOP_STALL_THRESHOLD and self._sessions:
+                with self._lock:
+                    for session in self._sessions:
+                        session.loop_stalls.append(lag)
+
+    def _write(self, session, duration):
+        os.makedirs(self.output_dir, exist_ok=True)
+        reason = 'sampled' if session.sampled else 'slow'
+        self.written += 1
+        filename = (
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{self.written:05d}-{session.name}"
+            f"-{int(duration * 1000)}ms-{reason}.collapsed"
+        )
+        path = os.path.join(self.output_dir, filename)
+
+        samples = Counter(session.samples)
+        if session.loop_stalls:
+            # Weighted like samples so stalls are comparable to stack time in the flamegraph
+            samples["[event loop stall]"] = int(sum(session.loop_stalls) / self.interval)
+        with open(path, 'w') as f:
+            for stack, hits in samples.most_common():
+                f.write(f"{stack} {hits}\n")
+
+        logger.info(
+            f"Wrote {reason} profile of {session.name} ({duration:.1f}s, "
+            f"{len(session.loop_stalls)} loop stalls) to {path}"
+        )
+        self._rotate()
+
+    def _rotate(self):
+        files = sorted(
+            (os.path.join(self.output_dir, name) for name in os.listdir(self.output_dir)
+             if name.endswith('.collapsed')),
+            key=os.path.getmtime
+        )
+        for path in files[:max(0, len(files) - self.max_files)]:
+            os.remove(path)
+
+    def status(self):
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'slow_threshold': self.slow_threshold,
+            'active_sessions': len(self._sessions),
+            'written': self.written,
+            'output_dir': self.output_dir,
+        }
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler():
+    """Returns the process-wide profiler shared by the bot and the marketplace clients"""
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = SamplingProfiler()
+        return _profiler
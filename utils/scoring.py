@@ -1,7 +1,48 @@
+import re
+
+_PRICE_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+# Currency markers found in price strings, checked in order (so 'E£' before '£')
+_CURRENCY_MARKERS = (
+    ('KSh', 'KES'), ('KES', 'KES'), ('₦', 'NGN'), ('NGN', 'NGN'), ('E£', 'EGP'), ('EGP', 'EGP'),
+    ('€', 'EUR'), ('EUR', 'EUR'), ('£', 'GBP'), ('GBP', 'GBP'), ('$', 'USD'), ('USD', 'USD'),
+)
+
+# Currency of prices without a marker, by marketplace region
+REGION_CURRENCIES = {
+    'com': 'USD', 'co.uk': 'GBP', 'de': 'EUR', 'fr': 'EUR', 'it': 'EUR', 'es': 'EUR',
+    'kenya': 'KES', 'nigeria': 'NGN', 'egypt': 'EGP',
+}
+
+
+def price_currency(product):
+    """
+    Currency code of a product's price, from the price itself ('KSh 1,300', '€12',
+    {'value': 9, 'currency': '$'}) or else from its region; None when unknown.
+    Prices are only comparable when their currencies match.
+    """
+    price = product.get('price')
+    if isinstance(price, dict):
+        price = price.get('currency')
+    if isinstance(price, str):
+        for marker, currency in _CURRENCY_MARKERS:
+            if marker in price:
+                return currency
+    return REGION_CURRENCIES.get(product.get('region'))
+
+
 def extract_price(price_str):
     """
-    Extracts numerical price from a string like '$123.45' or '123,45 €'
+    Extracts numerical price from a string like '$123.45' or '123,45 €'.
+    Numbers are returned as-is, ranges like '$1.20-$3.50' use the lower bound and
+    dict prices ({'value': 99.0, 'currency': '$'}, as Amazon returns) use their value.
     """
+    if isinstance(price_str, dict):
+        price_str = price_str.get('value')
+    if isinstance(price_str, bool):
+        return float('inf')
+    if isinstance(price_str, (int, float)):
+        return float(price_str)
     if not price_str or not isinstance(price_str, str):
         return float('inf')
     
@@ -12,17 +53,28 @@ def extract_price(price_str):
     try:
         return float(price_str)
     except (ValueError, TypeError):
-        return float('inf')
+        match = _PRICE_NUMBER.search(price_str)
+        return float(match.group()) if match else float('inf')
+
+def price_text(price):
+    """Display form of a price; dict prices ({'value': 99.0, 'currency': '$'}) become '$99.0'"""
+    if isinstance(price, dict):
+        value = price.get('value')
+        return 'N/A' if value is None else f"{price.get('currency') or ''}{value}"
+    return 'N/A' if price is None else str(price)
 
 def calculate_score(product):
     """
     Calculates a score for a product based on its rating, number of reviews, and price.
     """
-    # Get rating (0-5 scale)
-    rating = float(product.get('stars', 0) or 0)
+    # Get rating (0-5 scale); normalized products use 'rating', raw Amazon items 'stars'
+    rating = float(product.get('rating') or product.get('stars', 0) or 0)
     
     # Get number of reviews
-    reviews = int(product.get('reviewsCount', 0) or 0)
+    reviews = int(
+        product.get('reviews_count') or product.get('review_count')
+        or product.get('reviewsCount', 0) or 0
+    )
     
     # Get price as a number
     price_str = product.get('price', '')
@@ -0,0 +1,108 @@
+import random
+import zlib
+from collections import Counter, defaultdict
+
+_MASK_64 = (1 << 64) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def char_shingles(text, size=3):
+    """
+    Returns the set of character n-grams of a text, padded so short strings still shingle.
+    """
+    padded = f" {text} "
+    if len(padded) <= size:
+        return {padded}
+    return {padded[i:i + size] for i in range(len(padded) - size + 1)}
+
+
+def jaccard(first, second):
+    """
+    Jaccard similarity of two sets
+    """
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
+
+
+class MinHasher:
+    """
+    Computes fixed-size MinHash signatures of shingle sets.
+    Permutations use multiply-shift hashing, which avoids a modulo per shingle.
+    """
+
+    def __init__(self, num_perm=32, seed=1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._permutations = [
+            (rng.getrandbits(64) | 1, rng.getrandbits(64))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, shingles):
+        hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles]
+        if not hashes:
+            return (_MAX_HASH,) * self.num_perm
+        return tuple(
+            min(((a * h + b) & _MASK_64) >> 32 for h in hashes)
+            for a, b in self._permutations
+        )
+
+
+class LSHIndex:
+    """
+    Banded locality-sensitive hashing index over MinHash signatures.
+    Lookups only touch one bucket per band, so cost does not grow with the number of keys.
+    An optional partition (e.g. a namespace) keeps unrelated keys out of each other's buckets.
+    """
+
+    def __init__(self, num_perm=32, bands=8):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets = [defaultdict(set) for _ in range(bands)]
+        self._band_keys = {}
+
+    def __len__(self):
+        return len(self._band_keys)
+
+    def __contains__(self, key):
+        return key in self._band_keys
+
+    def _band_hashes(self, signature, partition):
+        return [
+            hash((partition, signature[band * self.rows:(band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+
+    def insert(self, key, signature, partition=None):
+        if key in self._band_keys:
+            self.remove(key)
+        band_hashes = self._band_hashes(signature, partition)
+        for buckets, band_hash in zip(self._buckets, band_hashes):
+            buckets[band_hash].add(key)
+        self._band_keys[key] = band_hashes
+
+    def remove(self, key):
+        band_hashes = self._band_keys.pop(key, None)
+        if band_hashes is None:
+            return
+        for buckets, band_hash in zip(self._buckets, band_hashes):
+            bucket = buckets.get(band_hash)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del buckets[band_hash]
+
+    def candidates(self, signature, partition=None, limit=None):
+        """
+        Returns keys sharing at least one band with the signature,
+        most band collisions first and at most `limit` of them.
+        """
+        hits = Counter()
+        for buckets, band_hash in zip(self._buckets, self._band_hashes(signature, partition)):
+            bucket = buckets.get(band_hash)
+            if bucket:
+                hits.update(bucket)
+        return [key for key, _ in hits.most_common(limit)]